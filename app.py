@@ -1,4 +1,5 @@
 import os
+import click
 from flask import Flask, render_template
 from dotenv import load_dotenv
 from extensions import db, login_manager, jwt, migrate # Import jwt from extensions.py
@@ -31,6 +32,24 @@ def create_app():
     if not os.path.exists(app.config['UPLOAD_FOLDERS']):
         os.makedirs(app.config['UPLOAD_FOLDERS'])
 
+    # Partial files of in-progress chunked uploads live outside the public static folder
+    app.config['CHUNKED_UPLOAD_FOLDER'] = os.path.join(app.instance_path, 'partial_uploads')
+    if not os.path.exists(app.config['CHUNKED_UPLOAD_FOLDER']):
+        os.makedirs(app.config['CHUNKED_UPLOAD_FOLDER'])
+
+    # Rendered progress PDFs, cached by a hash of the report
+    app.config['PDF_CACHE_FOLDER'] = os.path.join(app.instance_path, 'pdf_cache')
+    if not os.path.exists(app.config['PDF_CACHE_FOLDER']):
+        os.makedirs(app.config['PDF_CACHE_FOLDER'])
+
+
+    # Size the per-worker cache of parsed quiz questions
+    from services.quiz_cache import quiz_cache
+    quiz_cache.maxsize = app.config.get('QUIZ_CACHE_SIZE', 128)
+
+    # How long a built student progress report is reused across views and downloads
+    from services.progress import progress_reports
+    progress_reports.ttl = app.config.get('PROGRESS_CACHE_TTL', 60)
 
     # Initialize extensions with the app instance
     db.init_app(app)
@@ -69,6 +88,66 @@ def create_app():
     app.register_blueprint(main_bp)
     app.register_blueprint(api_bp, url_prefix='/api') # Register API blueprint with a prefix
 
+    # CLI commands
+    @app.cli.command('regrade-quiz')
+    @click.argument('quiz_id', type=int)
+    def regrade_quiz_command(quiz_id):
+        """Re-scores every submission of a quiz against its current answer key."""
+        from models import Quiz
+        from services.quizzes import regrade_quiz
+
+        quiz = Quiz.query.get(quiz_id)
+        if quiz is None:
+            raise click.ClickException(f'Quiz {quiz_id} not found.')
+        regraded = regrade_quiz(quiz)
+        click.echo(f"Regraded {regraded} submission(s) for quiz '{quiz.title}'.")
+
+    @app.cli.command('rebuild-gradebook')
+    def rebuild_gradebook_command():
+        """Rebuilds the materialized gradebook from the submission tables."""
+        from services.gradebook import rebuild_gradebook
+
+        written = rebuild_gradebook()
+        click.echo(f"Wrote {written} gradebook entr{'y' if written == 1 else 'ies'}.")
+
+    @app.cli.command('rebuild-calendar')
+    def rebuild_calendar_command():
+        """Rebuilds the calendar timeline from assignments, quizzes and announcements."""
+        from services.calendar import rebuild_calendar
+
+        written = rebuild_calendar()
+        click.echo(f"Wrote {written} calendar event(s).")
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Re-indexes every lesson, discussion, reply and announcement for search."""
+        from services.search import rebuild_search_index
+
+        written = rebuild_search_index()
+        click.echo(f"Indexed {written} document(s).")
+
+    @app.cli.command('cleanup-uploads')
+    def cleanup_uploads_command():
+        """Deletes chunked uploads that were abandoned more than a day ago."""
+        from services.uploads import remove_stale_uploads
+
+        removed = remove_stale_uploads()
+        click.echo(f"Removed {removed} stale upload(s).")
+
+    @app.cli.command('check-import-time')
+    @click.option('--budget-ms', type=int, default=None, help='Fail if startup imports take longer than this.')
+    def check_import_time_command(budget_ms):
+        """Profiles worker startup with `python -X importtime` and fails if it regressed."""
+        from services.import_check import check_startup
+
+        budget_ms = budget_ms or app.config.get('IMPORT_TIME_BUDGET_MS', 1500)
+        total_ms, problems, slowest = check_startup(budget_ms, cwd=app.root_path)
+        click.echo(f"Startup imports: {total_ms:.0f} ms (budget {budget_ms} ms)")
+        for module, cumulative in slowest:
+            click.echo(f"  {cumulative / 1000:8.1f} ms  {module}")
+        if problems:
+            raise click.ClickException(' '.join(problems))
+
     # Basic error handlers
     @app.errorhandler(404)
     def page_not_found(e):
@@ -85,4 +164,6 @@ if __name__ == '__main__':
     app = create_app()
     with app.app_context():
         db.create_all()
+        from services.search import create_search_index
+        create_search_index(db.engine)
     app.run(debug=True)
@@ -15,3 +15,32 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False # Disable tracking modifications for performance
     # UPLOAD_FOLDERS = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'static/uploads/courses')
 
+    # Number of parsed quiz question lists each worker keeps in memory
+    QUIZ_CACHE_SIZE = int(os.environ.get('QUIZ_CACHE_SIZE', 128))
+
+    # Seconds a student's progress report is cached for the HTML, CSV and PDF views
+    PROGRESS_CACHE_TTL = int(os.environ.get('PROGRESS_CACHE_TTL', 60))
+
+    # Background threads per worker process that run ffmpeg transcodes
+    MEDIA_WORKERS = int(os.environ.get('MEDIA_WORKERS', 1))
+
+    # Processes that lay out PDF reports, and how many renders may wait before new ones are refused
+    PDF_WORKERS = int(os.environ.get('PDF_WORKERS', 2))
+    PDF_QUEUE_SIZE = int(os.environ.get('PDF_QUEUE_SIZE', 8))
+
+    # Longest acceptable worker startup import time, checked by `flask check-import-time`
+    IMPORT_TIME_BUDGET_MS = int(os.environ.get('IMPORT_TIME_BUDGET_MS', 1500))
+
+    # Resumable uploads: largest file accepted, and the chunk size clients are told to use
+    MAX_UPLOAD_SIZE = 1000 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+
+    # Offload file downloads to the front-end server: 'x-sendfile' (Apache, lighttpd)
+    # or 'x-accel' (nginx, with an internal location aliasing static/uploads)
+    SENDFILE_BACKEND = os.environ.get('SENDFILE_BACKEND')
+    USE_X_SENDFILE = SENDFILE_BACKEND == 'x-sendfile'
+    ACCEL_REDIRECT_PREFIX = os.environ.get('ACCEL_REDIRECT_PREFIX', '/protected-uploads/')
+
+    # Topics loaded per page of a discussion board, and top-level replies per page of a thread
+    DISCUSSION_POSTS_PER_PAGE = int(os.environ.get('DISCUSSION_POSTS_PER_PAGE', 20))
+    REPLIES_PER_PAGE = int(os.environ.get('REPLIES_PER_PAGE', 20))
@@ -0,0 +1,60 @@
+"""add precomputed point and question aggregates to quiz
+
+Revision ID: 4b7e1c9a2d35
+Revises: 2a601e2be70a
+Create Date: 2026-10-16 09:12:41.305118
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7e1c9a2d35'
+down_revision = '2a601e2be70a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('quiz', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('question_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('total_points', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('mcq_points', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('open_ended_points', sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill the aggregates from the existing questions_json blobs
+    quiz = sa.table(
+        'quiz',
+        sa.column('id', sa.Integer),
+        sa.column('questions_json', sa.Text),
+        sa.column('question_count', sa.Integer),
+        sa.column('total_points', sa.Integer),
+        sa.column('mcq_points', sa.Integer),
+        sa.column('open_ended_points', sa.Integer),
+    )
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(quiz.c.id, quiz.c.questions_json)).fetchall()
+    for quiz_id, questions_json in rows:
+        try:
+            questions = json.loads(questions_json) or []
+        except (json.JSONDecodeError, TypeError):
+            questions = []
+        connection.execute(
+            quiz.update().where(quiz.c.id == quiz_id).values(
+                question_count=len(questions),
+                total_points=sum(q.get('points', 1) for q in questions),
+                mcq_points=sum(q.get('points', 1) for q in questions if q.get('type') == 'multiple_choice'),
+                open_ended_points=sum(q.get('points', 1) for q in questions if q.get('type') == 'open_ended'),
+            )
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('quiz', schema=None) as batch_op:
+        batch_op.drop_column('open_ended_points')
+        batch_op.drop_column('mcq_points')
+        batch_op.drop_column('total_points')
+        batch_op.drop_column('question_count')
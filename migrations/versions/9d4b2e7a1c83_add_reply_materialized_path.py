@@ -0,0 +1,62 @@
+"""add materialized path to replies and backfill it
+
+Revision ID: 9d4b2e7a1c83
+Revises: 7a3d1f6e9b52
+Create Date: 2026-10-16 18:31:57.402716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4b2e7a1c83'
+down_revision = '7a3d1f6e9b52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('replies', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('path', sa.String(length=1000), nullable=False, server_default=''))
+
+    # Backfill the paths from parent_reply_id, same format as services/discussions.reply_path
+    replies = sa.table(
+        'replies',
+        sa.column('id', sa.Integer),
+        sa.column('parent_reply_id', sa.Integer),
+        sa.column('path', sa.String),
+    )
+    connection = op.get_bind()
+    parents = dict(connection.execute(sa.select(replies.c.id, replies.c.parent_reply_id)).fetchall())
+    paths = {}
+
+    def path_of(reply_id):
+        # Walk up to the first ancestor whose path is known, then fill in on the way down
+        chain = []
+        while reply_id not in paths:
+            chain.append(reply_id)
+            parent_id = parents.get(reply_id)
+            if parent_id is None or parent_id not in parents or parent_id in chain:
+                paths[reply_id] = ''
+                chain.pop()
+                break
+            reply_id = parent_id
+        for child_id in reversed(chain):
+            parent_id = parents[child_id]
+            paths[child_id] = paths[parent_id] + f"{parent_id:010d}/"
+        return paths[chain[0]] if chain else paths[reply_id]
+
+    for reply_id in parents:
+        path = path_of(reply_id)
+        if path:
+            connection.execute(replies.update().where(replies.c.id == reply_id).values(path=path))
+
+    with op.batch_alter_table('replies', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_replies_path'), ['path'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('replies', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_replies_path'))
+        batch_op.drop_column('path')
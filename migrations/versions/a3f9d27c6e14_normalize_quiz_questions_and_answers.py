@@ -0,0 +1,207 @@
+"""move quiz questions and submitted answers from JSON columns into tables
+
+Revision ID: a3f9d27c6e14
+Revises: 4b7e1c9a2d35
+Create Date: 2026-10-16 10:02:17.448260
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f9d27c6e14'
+down_revision = '4b7e1c9a2d35'
+branch_labels = None
+depends_on = None
+
+
+quiz = sa.table(
+    'quiz',
+    sa.column('id', sa.Integer),
+    sa.column('questions_json', sa.Text),
+)
+
+quiz_submission = sa.table(
+    'quiz_submission',
+    sa.column('id', sa.Integer),
+    sa.column('quiz_id', sa.Integer),
+    sa.column('submitted_answers_json', sa.Text),
+)
+
+# A full Table with its primary key, so inserts report the new question id
+quiz_questions = sa.Table(
+    'quiz_questions',
+    sa.MetaData(),
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('quiz_id', sa.Integer),
+    sa.Column('position', sa.Integer),
+    sa.Column('type', sa.String),
+    sa.Column('question', sa.Text),
+    sa.Column('options_json', sa.Text),
+    sa.Column('answer', sa.Text),
+    sa.Column('points', sa.Integer),
+)
+
+quiz_answers = sa.table(
+    'quiz_answers',
+    sa.column('id', sa.Integer),
+    sa.column('submission_id', sa.Integer),
+    sa.column('question_id', sa.Integer),
+    sa.column('submitted_answer', sa.Text),
+    sa.column('is_correct', sa.Boolean),
+    sa.column('awarded_points', sa.Integer),
+)
+
+
+def _load_json_list(value):
+    try:
+        data = json.loads(value) if value else []
+    except (json.JSONDecodeError, TypeError):
+        return []
+    return data if isinstance(data, list) else []
+
+
+def upgrade():
+    op.create_table('quiz_questions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('quiz_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('type', sa.String(length=20), nullable=False),
+    sa.Column('question', sa.Text(), nullable=False),
+    sa.Column('options_json', sa.Text(), nullable=True),
+    sa.Column('answer', sa.Text(), nullable=True),
+    sa.Column('points', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['quiz_id'], ['quiz.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('quiz_questions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_quiz_questions_quiz_id'), ['quiz_id'], unique=False)
+
+    op.create_table('quiz_answers',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('submission_id', sa.Integer(), nullable=False),
+    sa.Column('question_id', sa.Integer(), nullable=False),
+    sa.Column('submitted_answer', sa.Text(), nullable=True),
+    sa.Column('is_correct', sa.Boolean(), nullable=False),
+    sa.Column('awarded_points', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['question_id'], ['quiz_questions.id'], ),
+    sa.ForeignKeyConstraint(['submission_id'], ['quiz_submission.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('quiz_answers', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_quiz_answers_question_id'), ['question_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_quiz_answers_submission_id'), ['submission_id'], unique=False)
+
+    with op.batch_alter_table('quiz', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+    connection = op.get_bind()
+
+    # Convert every quiz's questions_json into QuizQuestion rows
+    question_ids = {}
+    for quiz_id, questions_json in connection.execute(sa.select(quiz.c.id, quiz.c.questions_json)).fetchall():
+        for position, question in enumerate(_load_json_list(questions_json)):
+            result = connection.execute(quiz_questions.insert().values(
+                quiz_id=quiz_id,
+                position=position,
+                type=question.get('type', 'open_ended'),
+                question=question.get('question', ''),
+                options_json=json.dumps(question['options']) if question.get('options') is not None else None,
+                answer=question.get('answer'),
+                points=question.get('points', 1),
+            ))
+            question_ids[(quiz_id, position)] = result.inserted_primary_key[0]
+
+    # Convert every submission's answers, matching them to questions by position
+    submissions = connection.execute(
+        sa.select(quiz_submission.c.id, quiz_submission.c.quiz_id, quiz_submission.c.submitted_answers_json)
+    ).fetchall()
+    for submission_id, quiz_id, answers_json in submissions:
+        for position, answer in enumerate(_load_json_list(answers_json)):
+            question_id = question_ids.get((quiz_id, position))
+            if question_id is None:
+                continue
+            is_correct = bool(answer.get('is_correct'))
+            if answer.get('type') == 'multiple_choice':
+                awarded_points = answer.get('points', 1) if is_correct else 0
+            else:
+                awarded_points = answer.get('awarded_points')
+            connection.execute(quiz_answers.insert().values(
+                submission_id=submission_id,
+                question_id=question_id,
+                submitted_answer=answer.get('submitted_answer'),
+                is_correct=is_correct,
+                awarded_points=awarded_points,
+            ))
+
+    with op.batch_alter_table('quiz_submission', schema=None) as batch_op:
+        batch_op.drop_column('submitted_answers_json')
+
+    with op.batch_alter_table('quiz', schema=None) as batch_op:
+        batch_op.drop_column('questions_json')
+
+
+def downgrade():
+    with op.batch_alter_table('quiz', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('questions_json', sa.Text(), nullable=False, server_default='[]'))
+
+    with op.batch_alter_table('quiz_submission', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('submitted_answers_json', sa.Text(), nullable=False, server_default='[]'))
+
+    connection = op.get_bind()
+
+    questions_by_quiz = {}
+    questions_by_id = {}
+    rows = connection.execute(sa.select(
+        quiz_questions.c.id, quiz_questions.c.quiz_id, quiz_questions.c.type, quiz_questions.c.question,
+        quiz_questions.c.options_json, quiz_questions.c.answer, quiz_questions.c.points
+    ).order_by(quiz_questions.c.quiz_id, quiz_questions.c.position)).fetchall()
+    for question_id, quiz_id, question_type, text, options_json, answer, points in rows:
+        question = {'type': question_type, 'question': text, 'answer': answer, 'points': points}
+        if options_json:
+            question['options'] = json.loads(options_json)
+        questions_by_quiz.setdefault(quiz_id, []).append(question)
+        questions_by_id[question_id] = question
+
+    for quiz_id, questions in questions_by_quiz.items():
+        connection.execute(quiz.update().where(quiz.c.id == quiz_id).values(questions_json=json.dumps(questions)))
+
+    answers_by_submission = {}
+    rows = connection.execute(sa.select(
+        quiz_answers.c.submission_id, quiz_answers.c.question_id, quiz_answers.c.submitted_answer,
+        quiz_answers.c.is_correct, quiz_answers.c.awarded_points
+    ).order_by(quiz_answers.c.submission_id, quiz_answers.c.id)).fetchall()
+    for submission_id, question_id, submitted_answer, is_correct, awarded_points in rows:
+        question = questions_by_id[question_id]
+        answers_by_submission.setdefault(submission_id, []).append({
+            'question': question['question'],
+            'type': question['type'],
+            'submitted_answer': submitted_answer,
+            'correct_answer': question['answer'],
+            'is_correct': bool(is_correct),
+            'points': question['points'],
+            'awarded_points': awarded_points,
+        })
+
+    for submission_id, answers in answers_by_submission.items():
+        connection.execute(
+            quiz_submission.update().where(quiz_submission.c.id == submission_id).values(
+                submitted_answers_json=json.dumps(answers)
+            )
+        )
+
+    with op.batch_alter_table('quiz', schema=None) as batch_op:
+        batch_op.drop_column('version')
+
+    with op.batch_alter_table('quiz_answers', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_quiz_answers_submission_id'))
+        batch_op.drop_index(batch_op.f('ix_quiz_answers_question_id'))
+
+    op.drop_table('quiz_answers')
+    with op.batch_alter_table('quiz_questions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_quiz_questions_quiz_id'))
+
+    op.drop_table('quiz_questions')
@@ -0,0 +1,96 @@
+"""add full-text search index over lessons, discussions and announcements
+
+Revision ID: d8a1c5f2e934
+Revises: c3f7a9e1b450
+Create Date: 2026-10-16 20:26:09.731584
+
+"""
+import html
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8a1c5f2e934'
+down_revision = 'c3f7a9e1b450'
+branch_labels = None
+depends_on = None
+
+# Same keys and text extraction as services/search
+SOURCE_CODES = {'lesson': 1, 'discussion_post': 2, 'reply': 3, 'announcement': 4, 'general_announcement': 5}
+KEY_STRIDE = 8
+_TAGS = re.compile(r'<[^>]+>')
+_SPACES = re.compile(r'\s+')
+
+
+def plain_text(content):
+    return _SPACES.sub(' ', html.unescape(_TAGS.sub(' ', content or ''))).strip()
+
+
+def upgrade():
+    connection = op.get_bind()
+    postgres = connection.dialect.name == 'postgresql'
+
+    if postgres:
+        op.execute("""
+            CREATE TABLE search_documents (
+                doc_id BIGINT PRIMARY KEY,
+                source_type VARCHAR(30) NOT NULL,
+                source_id INTEGER NOT NULL,
+                course_id INTEGER,
+                parent_id INTEGER,
+                title TEXT NOT NULL DEFAULT '',
+                body TEXT NOT NULL DEFAULT '',
+                document TSVECTOR GENERATED ALWAYS AS (
+                    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+                    setweight(to_tsvector('english', coalesce(body, '')), 'B')
+                ) STORED
+            )
+        """)
+        op.execute("CREATE INDEX ix_search_documents_document ON search_documents USING GIN (document)")
+        op.execute("CREATE INDEX ix_search_documents_course_id ON search_documents (course_id)")
+    else:
+        op.execute("""
+            CREATE VIRTUAL TABLE search_documents USING fts5(
+                source_type UNINDEXED, source_id UNINDEXED, course_id UNINDEXED, parent_id UNINDEXED,
+                title, body, tokenize = 'porter unicode61'
+            )
+        """)
+
+    # Backfill from the existing rows
+    key = 'doc_id' if postgres else 'rowid'
+    documents = sa.table(
+        'search_documents',
+        sa.column(key, sa.Integer),
+        sa.column('source_type', sa.String),
+        sa.column('source_id', sa.Integer),
+        sa.column('course_id', sa.Integer),
+        sa.column('parent_id', sa.Integer),
+        sa.column('title', sa.Text),
+        sa.column('body', sa.Text),
+    )
+    sources = (
+        ('lesson', "SELECT id, course_id, NULL, title, content FROM lesson"),
+        ('discussion_post', "SELECT id, course_id, NULL, title, content FROM discussion_posts"),
+        ('reply', "SELECT r.id, p.course_id, r.post_id, '', r.content FROM replies r JOIN discussion_posts p ON p.id = r.post_id"),
+        ('announcement', "SELECT id, course_id, NULL, title, content FROM announcements"),
+        ('general_announcement', "SELECT id, NULL, NULL, title, content FROM general_announcements"),
+    )
+    for source_type, query in sources:
+        rows = connection.execute(sa.text(query)).fetchall()
+        if rows:
+            connection.execute(documents.insert(), [{
+                key: source_id * KEY_STRIDE + SOURCE_CODES[source_type],
+                'source_type': source_type,
+                'source_id': source_id,
+                'course_id': course_id,
+                'parent_id': parent_id,
+                'title': title or '',
+                'body': plain_text(content),
+            } for source_id, course_id, parent_id, title, content in rows])
+
+
+def downgrade():
+    op.execute("DROP TABLE search_documents")
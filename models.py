@@ -3,7 +3,9 @@
 from extensions import db
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm import contains_eager
 from datetime import datetime
+import json
 
 # Intermediate table for the many-to-many relationship between users and courses
 class Enrollment(db.Model):
@@ -21,6 +23,7 @@ class User(db.Model, UserMixin):
     password_hash = db.Column(db.String(128), nullable=False)
     role = db.Column(db.String(20), default='student', nullable=False) # e.g., 'admin', 'teacher', 'student'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    calendar_token = db.Column(db.String(64), unique=True, nullable=True) # Secret in the user's .ics subscription URL
     
     # Defines the relationship to Course through Enrollment
     # This allows easy access to a user's enrolled courses: user.enrolled_courses
@@ -43,7 +46,10 @@ class Course(db.Model):
     created_by_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     content = db.Column(db.Text, nullable=True)
     file_path = db.Column(db.String(300), nullable=False)
+    file_name = db.Column(db.String(300), nullable=True) # Original name of the uploaded file
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped whenever an assignment, quiz or announcement of the course changes
+    calendar_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # The 'teacher' of the course is linked via the user ID
     teacher = db.relationship('User', backref='courses_created', lazy=True)
@@ -58,30 +64,144 @@ class Quiz(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
-    questions_json = db.Column(db.Text, nullable=False) # JSON string of questions, options, and correct answers
     due_date = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Bumped every time the questions change; used to invalidate cached question lists
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+    # Aggregates derived from the questions so list and result pages never have to load them
+    question_count = db.Column(db.Integer, nullable=False, default=0)
+    total_points = db.Column(db.Integer, nullable=False, default=0)
+    mcq_points = db.Column(db.Integer, nullable=False, default=0)
+    open_ended_points = db.Column(db.Integer, nullable=False, default=0)
     
     # The `quizzes` backref on Course is created here
     course = db.relationship('Course', backref=db.backref('quizzes', lazy=True))
+    questions = db.relationship('QuizQuestion', backref='quiz', lazy=True, order_by='QuizQuestion.position', cascade="all, delete-orphan")
     submissions = db.relationship('QuizSubmission', backref='quiz', lazy=True, cascade="all, delete-orphan")
 
+    def set_questions(self, questions):
+        """
+        Stores a list of question dicts as QuizQuestion rows and refreshes the
+        derived point/question counts. Existing rows are updated in place by
+        position so that answers already submitted keep pointing at them.
+        """
+        existing = list(self.questions)
+        for position, data in enumerate(questions):
+            if position < len(existing):
+                question = existing[position]
+            else:
+                question = QuizQuestion(position=position)
+                self.questions.append(question)
+            question.type = data.get('type')
+            question.question = data.get('question')
+            question.options = data.get('options')
+            question.answer = data.get('answer')
+            question.points = data.get('points', 1)
+        for stale in existing[len(questions):]:
+            self.questions.remove(stale)
+
+        self.version = (self.version or 0) + 1
+        self.question_count = len(questions)
+        self.mcq_points = sum(q.get('points', 1) for q in questions if q.get('type') == 'multiple_choice')
+        self.open_ended_points = sum(q.get('points', 1) for q in questions if q.get('type') == 'open_ended')
+        self.total_points = sum(q.get('points', 1) for q in questions)
+
     def __repr__(self):
         return f"Quiz('{self.title}', '{self.course_id}')"
 
+class QuizQuestion(db.Model):
+    """
+    A single question of a quiz, stored in display order.
+    """
+    __tablename__ = 'quiz_questions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)
+    type = db.Column(db.String(20), nullable=False) # 'multiple_choice' or 'open_ended'
+    question = db.Column(db.Text, nullable=False)
+    options_json = db.Column(db.Text, nullable=True) # JSON list of choices for multiple choice questions
+    answer = db.Column(db.Text, nullable=True)
+    points = db.Column(db.Integer, nullable=False, default=1)
+
+    # The `answers` backref on QuizAnswer is created here
+    answers = db.relationship('QuizAnswer', backref='question', lazy=True, cascade="all, delete-orphan")
+
+    @property
+    def options(self):
+        return json.loads(self.options_json) if self.options_json else []
+
+    @options.setter
+    def options(self, value):
+        self.options_json = json.dumps(value) if value is not None else None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.type,
+            'question': self.question,
+            'options': self.options,
+            'answer': self.answer,
+            'points': self.points
+        }
+
+    def __repr__(self):
+        return f"QuizQuestion('{self.quiz_id}', '{self.position}')"
+
 class QuizSubmission(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     score = db.Column(db.Integer, nullable=False)
-    submitted_answers_json = db.Column(db.Text, nullable=False) # JSON string of student's answers
     student = db.relationship('User', backref=db.backref('quiz_submissions', lazy=True))
     submission_dates = db.Column(db.DateTime, index=True, default=datetime.utcnow)
     is_graded = db.Column(db.Boolean, default=False) # Flag to indicate if the submission has been graded
 
+    answers = db.relationship('QuizAnswer', backref='submission', lazy=True, order_by='QuizAnswer.id', cascade="all, delete-orphan")
+
+    def load_answers(self):
+        """
+        Returns this submission's answers with their questions loaded in a single query.
+        """
+        return QuizAnswer.query.filter_by(submission_id=self.id).join(QuizAnswer.question).options(
+            contains_eager(QuizAnswer.question)
+        ).order_by(QuizQuestion.position).all()
+
     def __repr__(self):
         return f"QuizSubmission('{self.student_id}', '{self.quiz.title}', '{self.score}')"
 
+class QuizAnswer(db.Model):
+    """
+    A student's answer to one QuizQuestion within a QuizSubmission.
+    """
+    __tablename__ = 'quiz_answers'
+
+    id = db.Column(db.Integer, primary_key=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey('quiz_submission.id'), nullable=False, index=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('quiz_questions.id'), nullable=False, index=True)
+    submitted_answer = db.Column(db.Text, nullable=True)
+    is_correct = db.Column(db.Boolean, nullable=False, default=False)
+    awarded_points = db.Column(db.Integer, nullable=True) # NULL until an open-ended answer is graded
+
+    def to_dict(self):
+        """
+        Returns the answer in the shape the quiz result and grading templates expect.
+        """
+        return {
+            'question': self.question.question,
+            'type': self.question.type,
+            'submitted_answer': self.submitted_answer,
+            'correct_answer': self.question.answer,
+            'is_correct': self.is_correct,
+            'points': self.question.points,
+            'awarded_points': self.awarded_points
+        }
+
+    def __repr__(self):
+        return f"QuizAnswer('{self.submission_id}', '{self.question_id}')"
+
 class Lesson(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(150), nullable=False)
@@ -103,6 +223,7 @@ class Assignment(db.Model):
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     file_path = db.Column(db.String(200), nullable=True)
+    file_name = db.Column(db.String(300), nullable=True) # Original name of the uploaded file
     max_submissions = db.Column(db.Integer, default=1)
 
     # The `assignments` backref on Course is created here
@@ -118,6 +239,7 @@ class AssignmentSubmission(db.Model):
     assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), nullable=False)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     file_path = db.Column(db.String(200), nullable=False)
+    file_name = db.Column(db.String(300), nullable=True) # Original name of the uploaded file
     submission_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     grade = db.Column(db.Float, nullable=True) # Can be NULL until graded
     feedback = db.Column(db.Text, nullable=True) # Can be NULL until graded
@@ -133,11 +255,19 @@ class DiscussionPost(db.Model):
     Represents a main discussion post or topic.
     """
     __tablename__ = 'discussion_posts'
+    __table_args__ = (
+        db.Index('ix_discussion_posts_course_activity', 'course_id', 'last_activity_at'),
+        db.Index('ix_discussion_posts_course_created', 'course_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # Maintained by services/discussions whenever a reply is added, edited or deleted
+    reply_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_activity_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     
     # Foreign Keys
     author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -168,6 +298,11 @@ class Reply(db.Model):
     # A self-referential foreign key to support nested replies
     parent_reply_id = db.Column(db.Integer, db.ForeignKey('replies.id'), nullable=True)
 
+    # Materialized path: the ids of every ancestor, root first, each zero-padded
+    # and '/'-terminated ('' for a top-level reply). A reply's descendants are the
+    # rows whose path starts with its own path plus its id (see services/discussions)
+    path = db.Column(db.String(1000), nullable=False, default='', index=True)
+
     # The `replies` and `child_replies` backrefs are created here
     author = db.relationship('User', backref=db.backref('replies', lazy=True))
     parent_reply = db.relationship('Reply', remote_side=[id], backref=db.backref('child_replies', lazy='dynamic', cascade='all, delete-orphan'))
@@ -194,12 +329,25 @@ class Announcement(db.Model):
         return f'<Announcement {self.title}>'
 
 class CalendarEvent(db.Model):
+    """
+    The calendar timeline: one row per dated assignment, quiz, course
+    announcement or general announcement (course_id is NULL for the latter).
+    Maintained by services/calendar whenever one of those is written, so the
+    calendar is a single range query over this table.
+    """
     __tablename__ = 'calendar_events'
+    __table_args__ = (
+        db.UniqueConstraint('source_type', 'source_id', name='uq_calendar_events_source'),
+        db.Index('ix_calendar_events_course_start', 'course_id', 'start_time'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text, nullable=True)
     start_time = db.Column(db.DateTime, nullable=False)
     end_time = db.Column(db.DateTime, nullable=False)
+    source_type = db.Column(db.String(30), nullable=True) # 'assignment', 'quiz', 'announcement' or 'general_announcement'
+    source_id = db.Column(db.Integer, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Foreign keys
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=True)
@@ -229,6 +377,104 @@ class GeneralAnnouncement(db.Model):
         return f"<GeneralAnnouncement '{self.title}'>"
 
 
+class MediaJob(db.Model):
+    """
+    A background media processing job, e.g. transcoding an uploaded video to MP4.
+    Rows double as the persistent queue that the worker pool claims jobs from.
+    """
+    __tablename__ = 'media_jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True) # 'queued', 'running', 'done' or 'failed'
+    progress = db.Column(db.Integer, nullable=False, default=0) # Percentage complete
+    source_filename = db.Column(db.String(300), nullable=False)
+    output_filename = db.Column(db.String(300), nullable=True)
+    thumbnail_filename = db.Column(db.String(300), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True) # Refreshed by the worker while the job runs
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    # Foreign key to the user who uploaded the file
+    created_by_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+    def __repr__(self):
+        return f"<MediaJob {self.id} '{self.status}'>"
+
+class ChunkedUpload(db.Model):
+    """
+    An in-progress resumable upload. Chunks are appended to a partial file on
+    disk and received_bytes records how much of it has been verified, so an
+    interrupted transfer can continue from where it stopped.
+    """
+    __tablename__ = 'chunked_uploads'
+    id = db.Column(db.String(32), primary_key=True) # Random hex token handed to the client
+    target = db.Column(db.String(20), nullable=False) # 'courses' or 'assignments'
+    filename = db.Column(db.String(300), nullable=False) # Original name as chosen by the user
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Foreign key to the user performing the upload
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+    @property
+    def is_complete(self):
+        return self.received_bytes >= self.total_size
+
+    def __repr__(self):
+        return f"<ChunkedUpload {self.id} {self.received_bytes}/{self.total_size}>"
+
+class StoredBlob(db.Model):
+    """
+    One file in the content-addressed upload store. Identical uploads to the
+    same folder share a single blob; ref_count tracks how many Course,
+    Assignment or AssignmentSubmission rows point at it through file_path.
+    """
+    __tablename__ = 'stored_blobs'
+    __table_args__ = (
+        db.UniqueConstraint('target', 'sha256', name='uq_stored_blobs_target_sha256'),
+        db.UniqueConstraint('target', 'filename', name='uq_stored_blobs_target_filename'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    target = db.Column(db.String(20), nullable=False) # 'courses' or 'assignments'
+    sha256 = db.Column(db.String(64), nullable=False)
+    filename = db.Column(db.String(300), nullable=False) # Name on disk, also stored in file_path
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=1)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<StoredBlob {self.target}/{self.filename} refs={self.ref_count}>"
+
+class GradebookEntry(db.Model):
+    """
+    Materialized gradebook: one row per student and assignment or quiz,
+    holding the latest submission's score, the number of attempts and the
+    status. Maintained by services/gradebook whenever a submission is made
+    or graded, so reports read these rows instead of scanning submissions.
+    """
+    __tablename__ = 'gradebook_entries'
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'item_type', 'item_id', name='uq_gradebook_entries_student_item'),
+        db.Index('ix_gradebook_entries_course_student', 'course_id', 'student_id'),
+        db.Index('ix_gradebook_entries_item', 'item_type', 'item_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    item_type = db.Column(db.String(20), nullable=False) # 'assignment' or 'quiz'
+    item_id = db.Column(db.Integer, nullable=False)
+    submission_id = db.Column(db.Integer, nullable=False) # Latest submission
+    score = db.Column(db.Float, nullable=True) # Assignment grade or quiz score of the latest submission
+    attempts = db.Column(db.Integer, nullable=False, default=1)
+    status = db.Column(db.String(20), nullable=False) # 'Submitted' or 'Graded'
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<GradebookEntry {self.student_id} {self.item_type}:{self.item_id} {self.status}>"
+
 
 
 
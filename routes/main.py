@@ -2,18 +2,28 @@
 
 from datetime import datetime
 import os
-import csv
-import io
-import subprocess
-import uuid
+import re
 from werkzeug.utils import secure_filename
 from werkzeug.datastructures import FileStorage
-from flask import Blueprint, abort, current_app, jsonify, render_template, redirect, send_from_directory, url_for, request, flash, Response
+from werkzeug.http import is_resource_modified
+from flask import Blueprint, Response, abort, current_app, jsonify, render_template, redirect, send_file, stream_with_context, url_for, request, flash
 from flask_login import login_required, current_user
-from weasyprint import HTML, CSS
-from models import Course, User, Enrollment, Quiz, QuizSubmission, Lesson, Assignment, AssignmentSubmission, DiscussionPost, Reply, Announcement, CalendarEvent, GeneralAnnouncement
+from models import Course, User, Enrollment, Quiz, QuizSubmission, QuizAnswer, Lesson, Assignment, AssignmentSubmission, DiscussionPost, Reply, Announcement, CalendarEvent, GeneralAnnouncement, MediaJob, ChunkedUpload
 from extensions import db
-from sqlalchemy import desc
+from services.calendar import ICS_SOURCE_TYPES, CalendarFeed, bump_calendar_version, get_calendar_token, ics_lines, parse_range, remove_course_events, remove_event, reset_calendar_token, sync_event
+from services.dashboard import get_student_dashboard_data
+from services.discussions import delete_reply_tree, get_post_page, get_reply_page, record_post_activity, reply_path
+from services.downloads import send_upload
+from services.media import enqueue_transcode
+from services.gradebook import refresh_entry, remove_course_entries, remove_entries
+from services.exports import gradebook_rows, stream_csv, user_rows
+from services.pdf_reports import QueueFull, get_status, pdf_path, request_pdf
+from services.progress import PDF_STYLESHEET, get_course_gradebook, progress_csv_rows, progress_reports, render_progress_html, render_progress_pdf_html
+from services.uploads import UPLOAD_TARGETS, ChunkError, create_upload, get_uploaded_file, write_chunk
+from services.quiz_cache import quiz_cache
+from services.storage import allocate_filename, release_file, store_file
+from services.quizzes import get_item_analysis, regrade_quiz
+from services.search import search
 from sqlalchemy.orm import joinedload
 import json
 
@@ -28,98 +38,19 @@ def allowed_file(filename):
     return '.' in filename and \
             filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-# def convert_video_to_mp4(input_path, output_path):
-#     """
-#     Converts a video file to a web-friendly MP4 format using FFmpeg.
-    
-#     Args:
-#         input_path (str): The path to the input video file.
-#         output_path (str): The desired path for the output MP4 file.
-        
-#     Returns:
-#         bool: True if the conversion was successful, False otherwise.
-#     """
-#     try:
-#         # Check if FFmpeg is installed and accessible
-#         subprocess.run(['ffmpeg', '-version'], check=True, capture_output=True)
-        
-#         # FFmpeg command to convert video to H.264 MP4 with AAC audio
-#         command = [
-#             'ffmpeg',
-#             '-i', input_path,  # Input file
-#             '-vcodec', 'libx264',  # Video codec
-#             '-acodec', 'aac',    # Audio codec
-#             '-strict', 'experimental', # Required for some AAC encoders
-#             '-movflags', 'faststart', # Optimizes for web streaming
-#             '-y', output_path # Overwrite output file if it exists
-#         ]
-        
-#         # Execute the FFmpeg command
-#         subprocess.run(command, check=True, capture_output=True)
-        
-#         return True
-#     except FileNotFoundError:
-#         print("FFmpeg not found. Please ensure it is installed and in your system's PATH.")
-#         return False
-#     except subprocess.CalledProcessError as e:
-#         print(f"An error occurred during FFmpeg conversion: {e.stderr.decode()}")
-#         return False
-#     except Exception as e:
-#         print(f"An unexpected error occurred: {e}")
-#         return False
-
-def convert_video_to_mp4(input_path, output_path):
-    """
-    Converts a video file to a web-friendly MP4 format using FFmpeg.
-    
-    Args:
-        input_path (str): The path to the input video file.
-        output_path (str): The desired path for the output MP4 file.
-        
-    Returns:
-        bool: True if the conversion was successful, False otherwise.
+def download_name(filename, *models):
     """
-    try:
-        subprocess.run(['ffmpeg', '-version'], check=True, capture_output=True)
-        command = [
-            'ffmpeg',
-            '-i', input_path,  # Input file
-            '-vcodec', 'libx264',  # Video codec
-            '-acodec', 'aac',    # Audio codec
-            '-strict', 'experimental', # Required for some AAC encoders
-            '-movflags', 'faststart', # Optimizes for web streaming
-            '-y', output_path # Overwrite output file if it exists
-        ]
-        subprocess.run(command, check=True, capture_output=True)
-        return True
-    except (FileNotFoundError, subprocess.CalledProcessError) as e:
-        print(f"Error during FFmpeg conversion: {e}")
-        return False
-
-def extract_video_thumbnail(video_path, thumbnail_path):
-    """
-    Extracts a single frame from a video file using FFmpeg and saves it as a JPEG.
-    
-    Args:
-        video_path (str): The path to the input video file.
-        thumbnail_path (str): The desired path for the output thumbnail image.
-        
-    Returns:
-        bool: True if the thumbnail extraction was successful, False otherwise.
+    Name offered to the browser for a download: the original upload name
+    stored in the file_name column of a `models` row whose file_path is
+    `filename`, falling back to the stored filename.
     """
-    try:
-        command = [
-            'ffmpeg',
-            '-i', video_path,
-            '-ss', '00:00:03.000',  # Grab frame at 3 seconds
-            '-vframes', '1',
-            '-y', thumbnail_path
-        ]
-        subprocess.run(command, check=True, capture_output=True)
-        return True
-    except (FileNotFoundError, subprocess.CalledProcessError) as e:
-        print(f"Error extracting thumbnail: {e}")
-        return False
+    for model in models:
+        file_name = db.session.query(model.file_name).filter(
+            model.file_path == filename, model.file_name.isnot(None)
+        ).limit(1).scalar()
+        if file_name:
+            return file_name
+    return filename
 
 @main_bp.route('/')
 def index():
@@ -210,6 +141,17 @@ def manage_users():
     users = User.query.all()
     return render_template('dashboards/manage_users.html', title='Manage Users', users=users)
 
+@main_bp.route('/admin/users/download/csv')
+@login_required
+def download_users_csv():
+    """
+    Streams a CSV export of every user account.
+    """
+    if current_user.role != 'admin':
+        return redirect(url_for('main.dashboard'))
+
+    return stream_csv(user_rows(), 'users.csv')
+
 @main_bp.route('/teacher')
 @login_required
 def teacher_dashboard():
@@ -263,23 +205,15 @@ def teacher_courses():
         title = request.form.get('title')
         description = request.form.get('description')
         content = request.form.get('content') # Ensure content is captured
-        file = request.files.get('file')
+        file = get_uploaded_file('courses')
         file_path = None
+        file_name = None
 
         if title:
-            if file and file.filename != '':
-                filename = secure_filename(file.filename)
-                filepath = os.path.join(current_app.config['UPLOAD_FOLDERS'], filename)
-                i = 1
-                while os.path.exists(filepath):
-                    name, ext = os.path.splitext(filename)
-                    filename = f"{name}_{i}{ext}"
-                    filepath = os.path.join(current_app.config['UPLOAD_FOLDERS'], filename)
-                    i += 1
-                
+            if file:
                 try:
-                    file.save(filepath)
-                    file_path = filename
+                    file_path = store_file(file, 'courses')
+                    file_name = file.filename
                 except Exception as e:
                     flash(f'An error occurred while uploading the file: {str(e)}', 'danger')
                     return redirect(url_for('main.teacher_courses'))
@@ -289,6 +223,7 @@ def teacher_courses():
                 description=description,
                 content=content,
                 file_path=file_path,
+                file_name=file_name,
                 created_by_user_id=current_user.id
             )
             db.session.add(new_course)
@@ -314,20 +249,17 @@ def edit_course(course_id):
         course.title = request.form.get('title')
         course.description = request.form.get('description')
         course.content = request.form.get('content') # Ensure content is captured
-        file = request.files.get('file')
-
-        if file and file.filename != '':
-            if course.file_path:
-                try:
-                    os.remove(os.path.join(current_app.config['UPLOAD_FOLDERS'], course.file_path))
-                except OSError as e:
-                    print(f"Error removing old file: {e}")
-            
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(current_app.config['UPLOAD_FOLDERS'], filename)
-            file.save(filepath)
-            course.file_path = filename
+        file = get_uploaded_file('courses')
+
+        if file:
+            new_file_path = store_file(file, 'courses')
+            # Released after storing so re-uploading the same file keeps its blob
+            release_file(course.file_path, 'courses')
+            course.file_path = new_file_path
+            course.file_name = file.filename
         
+        # Calendar event titles include the course title
+        bump_calendar_version(course.id)
         db.session.commit()
         flash('Course updated successfully!', 'success')
         return redirect(url_for('main.teacher_courses'))
@@ -345,14 +277,17 @@ def delete_course(course_id):
         return redirect(url_for('main.dashboard'))
     
     try:
-        if course.file_path:
-            file_path = os.path.join(current_app.config['UPLOAD_FOLDERS'], course.file_path)
-            if os.path.exists(file_path):
-                os.remove(file_path)
+        release_file(course.file_path, 'courses')
         for assignment in assignments:
+            # Submissions are removed by the cascade; only their file references need releasing
+            for submission in assignment.submissions:
+                release_file(submission.file_path, 'assignments')
+            release_file(assignment.file_path, 'assignments')
             db.session.delete(assignment)
         for lesson in lessons:
             db.session.delete(lesson)
+        remove_course_entries(course.id)
+        remove_course_events(course.id)
         db.session.delete(course)
         db.session.commit()
         flash('Course deleted successfully!', 'success')
@@ -368,7 +303,7 @@ def download_course_file(filename):
         flash("You must be logged in to download this file.", 'danger')
         return redirect(url_for('main.login'))
 
-    return send_from_directory(current_app.config['UPLOAD_FOLDERS'], filename, as_attachment=True)
+    return send_upload(current_app.config['UPLOAD_FOLDERS'], filename, download_name(filename, Course))
 
 @main_bp.route('/upload-file-tinymce', methods=['POST'])
 @login_required
@@ -381,42 +316,22 @@ def upload_file_tinymce():
     upload_folder = current_app.config['UPLOAD_FOLDERS']
     os.makedirs(upload_folder, exist_ok=True)
 
-    filename = secure_filename(file.filename)
+    filename = allocate_filename(upload_folder, file.filename)
     original_filepath = os.path.join(upload_folder, filename)
     
-    i = 1
-    while os.path.exists(original_filepath):
-        name, ext = os.path.splitext(filename)
-        filename = f"{name}_{i}{ext}"
-        original_filepath = os.path.join(upload_folder, filename)
-        i += 1
-    
     try:
         file.save(original_filepath)
         
         if file.content_type.startswith('video/'):
-            name, ext = os.path.splitext(filename)
-            output_filename = f"{name}.mp4"
-            output_filepath = os.path.join(upload_folder, output_filename)
-            
-            if convert_video_to_mp4(original_filepath, output_filepath):
-                os.remove(original_filepath) # Delete the original file
-                
-                # Now, extract the thumbnail from the newly converted video
-                thumbnail_filename = f"{name}_thumb.jpg"
-                thumbnail_filepath = os.path.join(upload_folder, thumbnail_filename)
-                
-                if extract_video_thumbnail(output_filepath, thumbnail_filepath):
-                    # Return both the video URL and the thumbnail URL
-                    video_url = url_for('main.download_course_file', filename=output_filename)
-                    thumbnail_url = url_for('main.download_course_file', filename=thumbnail_filename)
-                    return jsonify({'location': video_url, 'poster': thumbnail_url})
-                else:
-                    # Conversion was fine, but thumbnail failed.
-                    return jsonify({'location': url_for('main.download_course_file', filename=output_filename)})
-            else:
-                print(f"Video conversion failed for {filename}. Serving original file.")
-                return jsonify({'location': url_for('main.download_course_file', filename=filename)})
+            # Transcoding runs in the background worker pool. The stable media URL
+            # serves the original upload until the MP4 is ready, then switches over.
+            job = enqueue_transcode(filename, current_user.id)
+            return jsonify({
+                'location': url_for('main.media_job_file', job_id=job.id),
+                'poster': url_for('main.media_job_poster', job_id=job.id),
+                'job_id': job.id,
+                'status_url': url_for('main.media_job_status', job_id=job.id)
+            })
         else:
             return jsonify({'location': url_for('main.download_course_file', filename=filename)})
 
@@ -424,6 +339,98 @@ def upload_file_tinymce():
         print(f"Error during file upload: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@main_bp.route('/media-jobs/<int:job_id>')
+@login_required
+def media_job_status(job_id):
+    """Reports the progress of a background media job as JSON."""
+    job = MediaJob.query.get_or_404(job_id)
+    if not (current_user.role == 'admin' or job.created_by_user_id == current_user.id):
+        return jsonify({'error': 'Forbidden'}), 403
+
+    return jsonify({
+        'id': job.id,
+        'status': job.status,
+        'progress': job.progress,
+        'error': job.error,
+        'location': url_for('main.media_job_file', job_id=job.id),
+        'poster': url_for('main.download_course_file', filename=job.thumbnail_filename) if job.thumbnail_filename else None
+    })
+
+@main_bp.route('/media/<int:job_id>/file')
+def media_job_file(job_id):
+    """Serves the transcoded MP4 once it is ready, and the original upload until then."""
+    job = MediaJob.query.get_or_404(job_id)
+    filename = job.output_filename if job.status == 'done' else job.source_filename
+    return redirect(url_for('main.download_course_file', filename=filename))
+
+@main_bp.route('/media/<int:job_id>/poster')
+def media_job_poster(job_id):
+    """Serves the video thumbnail once the transcode job has produced one."""
+    job = MediaJob.query.get_or_404(job_id)
+    if not job.thumbnail_filename:
+        abort(404)
+    return redirect(url_for('main.download_course_file', filename=job.thumbnail_filename))
+
+
+@main_bp.route('/uploads/chunked', methods=['POST'])
+@login_required
+def start_chunked_upload():
+    """
+    Starts a resumable upload. Expects JSON with `filename`, `size` and `target`
+    ('courses' or 'assignments') and returns the upload id and chunk size to use.
+    """
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename') or '')
+    target = data.get('target')
+
+    try:
+        total_size = int(data.get('size'))
+    except (ValueError, TypeError):
+        return jsonify({'error': 'A valid file size is required.'}), 400
+
+    if not filename or target not in UPLOAD_TARGETS:
+        return jsonify({'error': 'A filename and a valid upload target are required.'}), 400
+    if target == 'courses' and current_user.role not in ['teacher', 'admin']:
+        return jsonify({'error': 'You do not have permission to upload course files.'}), 403
+    if target == 'assignments' and not allowed_file(filename):
+        return jsonify({'error': 'Invalid file type. Allowed file types are: ' + ', '.join(ALLOWED_EXTENSIONS)}), 400
+    if total_size <= 0 or total_size > current_app.config['MAX_UPLOAD_SIZE']:
+        return jsonify({'error': 'File is empty or too large.'}), 413
+
+    upload = create_upload(current_user, filename, total_size, target)
+    return jsonify({
+        'upload_id': upload.id,
+        'received_bytes': upload.received_bytes,
+        'chunk_size': current_app.config['UPLOAD_CHUNK_SIZE']
+    }), 201
+
+@main_bp.route('/uploads/chunked/<string:upload_id>', methods=['GET', 'PUT'])
+@login_required
+def chunked_upload(upload_id):
+    """
+    GET reports how many bytes have been received so a client can resume.
+    PUT appends one chunk, sent as the raw request body at `?offset=`, with an
+    optional `X-Chunk-SHA256` header that is verified before the chunk is kept.
+    """
+    upload = ChunkedUpload.query.filter_by(id=upload_id, user_id=current_user.id).first_or_404()
+
+    if request.method == 'PUT':
+        try:
+            offset = int(request.args.get('offset', ''))
+            write_chunk(upload, offset, request.stream, request.headers.get('X-Chunk-SHA256'))
+        except ValueError:
+            return jsonify({'error': 'A valid offset is required.'}), 400
+        except ChunkError as e:
+            db.session.refresh(upload)
+            return jsonify({'error': str(e), 'received_bytes': upload.received_bytes}), e.status
+
+    return jsonify({
+        'upload_id': upload.id,
+        'received_bytes': upload.received_bytes,
+        'total_size': upload.total_size,
+        'chunk_size': current_app.config['UPLOAD_CHUNK_SIZE'],
+        'complete': upload.is_complete
+    })
 
 @main_bp.route('/teacher/courses/<int:course_id>/students')
 @login_required
@@ -504,10 +511,11 @@ def manage_quizzes(course_id):
 
             new_quiz = Quiz(
                 title=quiz_title,
-                course_id=course.id,
-                questions_json=questions_json_str
+                course_id=course.id
             )
+            new_quiz.set_questions(questions_data)
             db.session.add(new_quiz)
+            sync_event('quiz', new_quiz)
             db.session.commit()
             flash('Quiz created successfully!', 'success')
         except json.JSONDecodeError:
@@ -529,7 +537,7 @@ def preview_quiz(quiz_id):
         flash("You do not have permission to preview this quiz.", 'danger')
         return redirect(url_for('main.dashboard'))
     
-    questions = json.loads(quiz.questions_json)
+    questions = quiz_cache.get_questions(quiz)
     
     return render_template('quizzes/preview_quiz.html', title=f'Preview: {quiz.title}', quiz=quiz, questions=questions)
 
@@ -543,9 +551,15 @@ def delete_quiz(quiz_id):
         return redirect(url_for('main.dashboard'))
 
     try:
+        # Bulk deletes skip the ORM cascade, so clear the answers explicitly first
+        submission_ids = db.session.query(QuizSubmission.id).filter_by(quiz_id=quiz.id)
+        QuizAnswer.query.filter(QuizAnswer.submission_id.in_(submission_ids)).delete(synchronize_session=False)
         QuizSubmission.query.filter_by(quiz_id=quiz.id).delete()
+        remove_entries('quiz', quiz.id)
+        remove_event('quiz', quiz.id, quiz.course_id)
         db.session.delete(quiz)
         db.session.commit()
+        quiz_cache.invalidate(quiz_id)
         flash('Quiz and all associated submissions deleted successfully!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -575,34 +589,9 @@ def student_dashboard():
             flash('Course not found!', 'danger')
         return redirect(url_for('main.student_dashboard'))
     
-    all_courses = Course.query.all()
-    enrolled_course_ids = [c.id for c in current_user.enrolled_courses]
-    available_courses = [c for c in all_courses if c.id not in enrolled_course_ids]
-
-    enrolled_courses = []
-    for course in current_user.enrolled_courses:
-        quizzes = Quiz.query.filter_by(course_id=course.id).all()
-        quizzes_with_status = []
-        for quiz in quizzes:
-            submission = QuizSubmission.query.filter_by(student_id=current_user.id, quiz_id=quiz.id).first()
-            questions_data = json.loads(quiz.questions_json)
-            total_questions = len(questions_data) if questions_data else 0
-            total_points = sum(q['points'] for q in questions_data) if questions_data else 0
-
-            quizzes_with_status.append({
-                'id': quiz.id,
-                'title': quiz.title,
-                'is_completed': submission is not None,
-                'score': submission.score if submission else None,
-                'submission_id': submission.id if submission else None,
-                'total_questions': total_questions,
-                'total_points': total_points,
-                'percentage': (submission.score / total_points * 100) if submission and total_points > 0 else None
-            })
-        enrolled_courses.append({
-            'course': course,
-            'quizzes': quizzes_with_status
-        })
+    enrolled_courses = get_student_dashboard_data(current_user)
+    enrolled_course_ids = [entry['course'].id for entry in enrolled_courses]
+    available_courses = Course.query.filter(Course.id.notin_(enrolled_course_ids)).all()
 
     return render_template('dashboards/student_dashboard.html', 
                             title='Student Dashboard', 
@@ -630,13 +619,8 @@ def take_quiz(quiz_id):
         flash("You have already submitted this quiz.", 'info')
         return redirect(url_for('main.quiz_results', submission_id=submission.id))
 
-    # Parse the questions_json string into a Python list
-    try:
-        quiz_questions = json.loads(quiz.questions_json)
-    except (json.JSONDecodeError, TypeError):
-        # Handle cases where the JSON is invalid or missing
-        quiz_questions = []
-        flash("There was an error loading the quiz questions. Please contact your teacher.", 'danger')
+    # Question lists are cached per worker and invalidated when the quiz version changes
+    quiz_questions = quiz_cache.get_questions(quiz)
 
     return render_template('quizzes/take_quiz.html', quiz=quiz, quiz_questions=quiz_questions)
 
@@ -652,7 +636,7 @@ def submit_quiz(quiz_id):
         flash("You are not authorized to submit this quiz or have already done so.", 'danger')
         return redirect(url_for('main.student_dashboard'))
     
-    quiz_questions = json.loads(quiz.questions_json)
+    quiz_questions = quiz_cache.get_questions(quiz)
     student_answers = []
     mcq_score = 0
     open_ended_questions_exist = False
@@ -665,20 +649,18 @@ def submit_quiz(quiz_id):
         if question['type'] == 'multiple_choice':
             is_correct = (student_answer == question['answer'])
             if is_correct:
-                mcq_score += question.get('points', 1)
+                mcq_score += question['points']
         elif question['type'] == 'open_ended':
             is_correct = False # Open-ended answers are not auto-graded anymore
             open_ended_questions_exist = True
         
-        student_answers.append({
-            'question': question['question'],
-            'type': question['type'],
-            'submitted_answer': student_answer,
-            'correct_answer': question['answer'],
-            'is_correct': is_correct,
-            'points': question.get('points', 1),
-            'awarded_points': mcq_score if is_correct else 0 if question['type'] == 'multiple_choice' else None # Initialize awarded points for manual grading
-        })
+        student_answers.append(QuizAnswer(
+            question_id=question['id'],
+            submitted_answer=student_answer,
+            is_correct=is_correct,
+            # Open-ended answers stay ungraded until the teacher awards points
+            awarded_points=(question['points'] if is_correct else 0) if question['type'] == 'multiple_choice' else None
+        ))
 
     new_submission = QuizSubmission(
         quiz_id=quiz.id,
@@ -686,10 +668,12 @@ def submit_quiz(quiz_id):
         # The score here will only be for multiple choice questions.
         score=mcq_score,
         is_graded= not open_ended_questions_exist, # If no open-ended questions, it's fully graded
-        submitted_answers_json=json.dumps(student_answers)
+        answers=student_answers
     )
     db.session.add(new_submission)
+    refresh_entry('quiz', quiz, current_user.id)
     db.session.commit()
+    progress_reports.invalidate(current_user.id)
     flash(f"Quiz '{quiz.title}' submitted successfully! Your multiple-choice score is {mcq_score}.", 'success')
 
     return redirect(url_for('main.quiz_results', submission_id=new_submission.id))
@@ -708,12 +692,9 @@ def quiz_results(submission_id):
         flash("You do not have permission to view these results.", 'danger')
         return redirect(url_for('main.teacher_dashboard'))
 
-    submitted_answers = json.loads(submission.submitted_answers_json)
-    quiz_questions = json.loads(submission.quiz.questions_json)
-    
-    total_possible_score_mcq = sum(q.get('points', 1) for q in quiz_questions if q['type'] == 'multiple_choice')
-    total_possible_score_open_ended = sum(q.get('points', 1) for q in quiz_questions if q['type'] == 'open_ended')
-    total_possible_score = total_possible_score_mcq + total_possible_score_open_ended
+    submitted_answers = [answer.to_dict() for answer in submission.load_answers()]
+    total_possible_score_mcq = submission.quiz.mcq_points
+    total_possible_score = submission.quiz.mcq_points + submission.quiz.open_ended_points
 
     return render_template('quizzes/quiz_results.html', 
                             title=f'Quiz Results: {submission.quiz.title}', 
@@ -772,44 +753,47 @@ def teacher_grade_submission(submission_id):
         flash("You do not have permission to grade this submission.", 'danger')
         return redirect(url_for('main.teacher_dashboard'))
 
-    submitted_answers = json.loads(submission.submitted_answers_json)
+    answers = submission.load_answers()
 
     if request.method == 'POST':
         # Step 1: Calculate MCQ score fresh
         mcq_score = sum(
-            ans['points'] if ans['type'] == 'multiple_choice' and ans.get('is_correct') else 0
-            for ans in submitted_answers
+            answer.question.points if answer.question.type == 'multiple_choice' and answer.is_correct else 0
+            for answer in answers
         )
 
         # Step 2: Reset open-ended scores & add teacher-awarded points
         total_score = mcq_score
-        for i, answer in enumerate(submitted_answers):
-            if answer['type'] == 'open_ended':
+        for i, answer in enumerate(answers):
+            if answer.question.type == 'open_ended':
                 try:
                     awarded_points = int(request.form.get(f'awarded_points_{i}', 0))
 
                     # Per-question limit check
-                    if awarded_points > answer['points']:
-                        flash(f"Points for question {i+1} cannot exceed {answer['points']}.", 'danger')
+                    if awarded_points > answer.question.points:
+                        db.session.rollback()
+                        flash(f"Points for question {i+1} cannot exceed {answer.question.points}.", 'danger')
                         return redirect(url_for('main.teacher_grade_submission', submission_id=submission.id))
 
-                    answer['awarded_points'] = awarded_points
+                    answer.awarded_points = awarded_points
                     total_score += awarded_points
 
                 except (ValueError, TypeError):
+                    db.session.rollback()
                     flash(f"Invalid score for question {i+1}. Please enter a valid number.", 'danger')
                     return redirect(url_for('main.teacher_grade_submission', submission_id=submission.id))
 
         # Step 3: Total quiz score limit check
-        quiz_total_points = sum(a['points'] for a in submitted_answers)
+        quiz_total_points = sum(answer.question.points for answer in answers)
         if total_score > quiz_total_points:
+            db.session.rollback()
             flash(f"Total score {total_score} exceeds quiz maximum of {quiz_total_points}.", 'danger')
             return redirect(url_for('main.teacher_grade_submission', submission_id=submission.id))
 
         # Step 4: Save updated score
         submission.score = total_score
-        submission.submitted_answers_json = json.dumps(submitted_answers)
         submission.is_graded = True
+        refresh_entry('quiz', quiz, submission.student_id)
         db.session.commit()
 
         flash("Submission graded successfully!", 'success')
@@ -819,7 +803,7 @@ def teacher_grade_submission(submission_id):
         'quizzes/teacher_grade_submission.html',
         title=f'Grade Submission for {submission.quiz.title}',
         submission=submission,
-        submitted_answers=submitted_answers
+        submitted_answers=[answer.to_dict() for answer in answers]
     )
 
 @main_bp.route('/teacher/quizzes/<int:quiz_id>/submissions')
@@ -831,10 +815,8 @@ def view_quiz_submissions(quiz_id):
         return redirect(url_for('main.dashboard'))
     
     submissions = QuizSubmission.query.filter_by(quiz_id=quiz.id).all()
-    quiz_questions = json.loads(quiz.questions_json)
-    total_possible_score_mcq = sum(q.get('points', 1) for q in quiz_questions if q['type'] == 'multiple_choice')
-    total_possible_score_open_ended = sum(q.get('points', 1) for q in quiz_questions if q['type'] == 'open_ended')
-    total_possible_score = total_possible_score_mcq + total_possible_score_open_ended
+    total_possible_score_mcq = quiz.mcq_points
+    total_possible_score = quiz.mcq_points + quiz.open_ended_points
 
     return render_template('quizzes/view_quiz_submissions.html', 
                             title=f'Submissions for {quiz.title}', 
@@ -842,7 +824,28 @@ def view_quiz_submissions(quiz_id):
                             submissions=submissions,
                             submission_dates=[s.submission_dates for s in submissions],
                             total_possible_score=total_possible_score,
-                            total_possible_score_mcq=total_possible_score_mcq)
+                            total_possible_score_mcq=total_possible_score_mcq,
+                            item_stats=get_item_analysis(quiz) if submissions else [])
+
+@main_bp.route('/teacher/quizzes/<int:quiz_id>/regrade', methods=['POST'])
+@login_required
+def regrade_quiz_submissions(quiz_id):
+    """
+    Re-scores all submissions of a quiz against its current answer key.
+    """
+    quiz = Quiz.query.get_or_404(quiz_id)
+    if not (current_user.role == 'admin' or (current_user.role == 'teacher' and quiz.course.created_by_user_id == current_user.id)):
+        flash("You do not have permission to regrade this quiz.", 'danger')
+        return redirect(url_for('main.dashboard'))
+
+    try:
+        regraded = regrade_quiz(quiz)
+        flash(f'{regraded} submission(s) regraded against the current answer key.', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'An error occurred while regrading: {str(e)}', 'danger')
+
+    return redirect(url_for('main.view_quiz_submissions', quiz_id=quiz.id))
 
 @main_bp.route('/teacher/quizzes/results/<int:submission_id>')
 @login_required
@@ -854,9 +857,8 @@ def teacher_quiz_results(submission_id):
         flash("You do not have permission to view these results.", 'danger')
         return redirect(url_for('main.dashboard'))
 
-    submitted_answers = json.loads(submission.submitted_answers_json)
-    quiz_questions = json.loads(quiz.questions_json)
-    total_possible_score = sum(q.get('points', 1) for q in quiz_questions)
+    submitted_answers = [answer.to_dict() for answer in submission.load_answers()]
+    total_possible_score = quiz.total_points
     
     return render_template('quizzes/teacher_quiz_results.html', 
                             title=f'Quiz Results: {quiz.title}', 
@@ -1066,14 +1068,12 @@ def create_assignment(course_id):
             return redirect(url_for('main.create_assignment', course_id=course_id))
 
         file_path = None
-        if 'file' in request.files and request.files['file'].filename != '':
-            file = request.files['file']
-            if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                unique_filename = str(uuid.uuid4()) + '_' + filename
-                filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
-                file.save(filepath)
-                file_path = unique_filename
+        file_name = None
+        file = get_uploaded_file('assignments')
+        if file:
+            if allowed_file(file.filename):
+                file_path = store_file(file, 'assignments')
+                file_name = file.filename
             else:
                 flash('Invalid file type for assignment. Allowed types are: ' + ', '.join(ALLOWED_EXTENSIONS), 'danger')
                 return redirect(url_for('main.create_assignment', course_id=course_id))
@@ -1084,9 +1084,11 @@ def create_assignment(course_id):
             due_date=due_date, 
             course_id=course_id, 
             file_path=file_path,
+            file_name=file_name,
             max_submissions=max_submissions # Save new field
         )
         db.session.add(new_assignment)
+        sync_event('assignment', new_assignment)
         db.session.commit()
         flash('Assignment created successfully!', 'success')
         return redirect(url_for('main.view_assignments', course_id=course_id))
@@ -1120,23 +1122,18 @@ def edit_assignment(assignment_id):
             return redirect(url_for('main.edit_assignment', assignment_id=assignment_id))
 
         # Handle file upload for editing
-        if 'file' in request.files and request.files['file'].filename != '':
-            file = request.files['file']
-            if file and allowed_file(file.filename):
-                if assignment.file_path:
-                    old_filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], assignment.file_path)
-                    if os.path.exists(old_filepath):
-                        os.remove(old_filepath)
-                
-                filename = secure_filename(file.filename)
-                unique_filename = str(uuid.uuid4()) + '_' + filename
-                filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
-                file.save(filepath)
-                assignment.file_path = unique_filename
+        file = get_uploaded_file('assignments')
+        if file:
+            if allowed_file(file.filename):
+                new_file_path = store_file(file, 'assignments')
+                release_file(assignment.file_path, 'assignments')
+                assignment.file_path = new_file_path
+                assignment.file_name = file.filename
             else:
                 flash('Invalid file type for assignment. Allowed types are: ' + ', '.join(ALLOWED_EXTENSIONS), 'danger')
                 return redirect(url_for('main.edit_assignment', assignment_id=assignment_id))
         
+        sync_event('assignment', assignment)
         db.session.commit()
         flash('Assignment updated successfully!', 'success')
         return redirect(url_for('main.view_assignments', course_id=course.id))
@@ -1161,18 +1158,14 @@ def delete_assignment(assignment_id):
     # Delete associated student submissions first
     submissions = AssignmentSubmission.query.filter_by(assignment_id=assignment.id).all()
     for submission in submissions:
-        # Delete the file from the filesystem
-        if submission.file_path:
-            file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], submission.file_path)
-            if os.path.exists(file_path):
-                os.remove(file_path)
+        # Drop the submission's reference; the file goes once nothing else shares it
+        release_file(submission.file_path, 'assignments')
         db.session.delete(submission)
 
-    # Delete the teacher's uploaded file
-    if assignment.file_path:
-        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], assignment.file_path)
-        if os.path.exists(file_path):
-            os.remove(file_path)
+    # Release the teacher's uploaded file
+    release_file(assignment.file_path, 'assignments')
+    remove_entries('assignment', assignment.id)
+    remove_event('assignment', assignment.id, course.id)
 
     db.session.delete(assignment)
     db.session.commit()
@@ -1209,6 +1202,7 @@ def grade_submission(submission_id):
 
     submission.grade = grade
     submission.feedback = feedback
+    refresh_entry('assignment', assignment, submission.student_id)
     db.session.commit()
     flash('Grade and feedback submitted successfully!', 'success')
     return redirect(url_for('main.view_assignment', assignment_id=assignment.id))
@@ -1253,35 +1247,30 @@ def view_assignment(assignment_id):
             flash(f"Submission failed: You have already submitted {submission_count} times, which is the maximum allowed.", 'danger')
             return redirect(url_for('main.view_assignment', assignment_id=assignment.id))
 
-        if 'file' not in request.files:
-            flash('No file part', 'danger')
-            return redirect(request.url)
-        
-        file = request.files['file']
-        if file.filename == '':
+        file = get_uploaded_file('assignments')
+        if file is None:
             flash('No selected file', 'danger')
             return redirect(request.url)
 
-        if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            file_extension = filename.split('.')[-1]
-            unique_filename = f"{uuid.uuid4().hex}_{current_user.id}_{assignment.id}.{file_extension}"
-            
-            filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
-            file.save(filepath)
+        if allowed_file(file.filename):
+            # Identical resubmissions share one stored blob
+            file_path = store_file(file, 'assignments')
             
             # Create a new submission record
             new_submission = AssignmentSubmission(
                 assignment_id=assignment.id,
                 student_id=current_user.id,
-                file_path=unique_filename
+                file_path=file_path,
+                file_name=file.filename
             )
             db.session.add(new_submission)
             
             # The feedback will be a flash message for now
             flash(f'Your assignment has been submitted successfully! You have {assignment.max_submissions - (submission_count + 1)} attempts remaining.', 'success')
             
+            refresh_entry('assignment', assignment, current_user.id)
             db.session.commit()
+            progress_reports.invalidate(current_user.id)
             return redirect(url_for('main.view_assignment', assignment_id=assignment.id))
         else:
             flash('Invalid file type. Allowed file types are: ' + ', '.join(ALLOWED_EXTENSIONS), 'danger')
@@ -1317,7 +1306,7 @@ def download_assignment_file(filename):
         else:
             return redirect(url_for('main.teacher_dashboard'))
         
-    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename, as_attachment=True)
+    return send_upload(current_app.config['UPLOAD_FOLDER'], filename, download_name(filename, Assignment, AssignmentSubmission))
 
 @main_bp.route('/course/discussion/select_course', methods=['GET'])
 @login_required
@@ -1354,10 +1343,44 @@ def discussion_board(course_id):
         flash('You do not have access to this course.', 'danger')
         return redirect(url_for('main.dashboard'))
         
-    # Get all discussion posts for the course, ordered by creation date
-    discussion_posts = DiscussionPost.query.filter_by(course_id=course_id).order_by(desc(DiscussionPost.created_at)).all()
+    # Newest topics first, or the most recently active with ?sort=active.
+    # Only the first page is rendered; the rest is fetched from discussion_posts_page as the user scrolls
+    sort = 'active' if request.args.get('sort') == 'active' else 'newest'
+    discussion_posts, next_cursor = get_post_page(course_id, sort=sort, limit=current_app.config.get('DISCUSSION_POSTS_PER_PAGE', 20))
     
-    return render_template('discussions/discussion_board.html', course=course, discussion_posts=discussion_posts)
+    return render_template('discussions/discussion_board.html', course=course, discussion_posts=discussion_posts,
+                           sort=sort, next_cursor=next_cursor)
+
+@main_bp.route('/course/<int:course_id>/discussion/posts')
+@login_required
+def discussion_posts_page(course_id):
+    """
+    Returns the next page of a discussion board as JSON for infinite scrolling.
+    Takes the `sort` of the board and the `after` cursor of the previous page.
+    """
+    course = Course.query.get_or_404(course_id)
+
+    is_teacher = course.teacher == current_user
+    is_student = course in current_user.enrolled_courses.all()
+
+    if not is_teacher and not is_student:
+        return jsonify({'error': 'You do not have access to this course.'}), 403
+
+    sort = 'active' if request.args.get('sort') == 'active' else 'newest'
+    posts, next_cursor = get_post_page(course_id, sort=sort, after=request.args.get('after'),
+                                       limit=current_app.config.get('DISCUSSION_POSTS_PER_PAGE', 20))
+    return jsonify({
+        'posts': [{
+            'id': post.id,
+            'title': post.title,
+            'url': url_for('main.view_discussion_post', post_id=post.id),
+            'author': f"{post.author.username} ({post.author.role})",
+            'created_at': post.created_at.strftime('%B %d, %Y at %I:%M %p'),
+            'reply_count': post.reply_count,
+            'last_activity_at': post.last_activity_at.strftime('%B %d, %Y at %I:%M %p')
+        } for post in posts],
+        'next_cursor': next_cursor
+    })
 
 # Route to handle the creation of a new discussion post
 @main_bp.route('/course/<int:course_id>/discussion/new', methods=['POST'])
@@ -1401,9 +1424,12 @@ def create_discussion_post(course_id):
 @login_required
 def view_discussion_post(post_id):
     """
-    Displays a single discussion post and all its replies.
+    Displays a single discussion post and one page of its replies.
+
+    Top-level replies are paginated with the `after` cursor; each comes
+    with its whole subtree, loaded and assembled by get_reply_page.
     """
-    post = DiscussionPost.query.get_or_404(post_id)
+    post = DiscussionPost.query.options(joinedload(DiscussionPost.author)).filter_by(id=post_id).first_or_404()
     course = post.course
     
     is_teacher = course.teacher == current_user
@@ -1413,7 +1439,10 @@ def view_discussion_post(post_id):
         flash('You do not have access to this course.', 'danger')
         return redirect(url_for('main.dashboard'))
     
-    return render_template('discussions/view_discussion_post.html', post=post)
+    after = request.args.get('after')
+    replies, next_cursor = get_reply_page(post.id, after=after, limit=current_app.config.get('REPLIES_PER_PAGE', 20))
+    return render_template('discussions/view_discussion_post.html', post=post, replies=replies,
+                           next_cursor=next_cursor, is_first_page=not after)
 
 @main_bp.route('/discussion_post/<int:post_id>/reply', methods=['POST'])
 @login_required
@@ -1438,15 +1467,24 @@ def add_reply(post_id):
         if not content:
             flash('Reply content cannot be empty.', 'danger')
             return redirect(url_for('main.view_discussion_post', post_id=post.id))
+
+        parent_reply = None
+        if parent_reply_id:
+            parent_reply = Reply.query.filter_by(id=parent_reply_id, post_id=post.id).first()
+            if parent_reply is None:
+                flash('The reply you are responding to no longer exists.', 'danger')
+                return redirect(url_for('main.view_discussion_post', post_id=post.id))
             
         new_reply = Reply(
             content=content,
             author_id=current_user.id,
             post_id=post.id,
-            parent_reply_id=parent_reply_id if parent_reply_id else None
+            parent_reply_id=parent_reply.id if parent_reply else None,
+            path=reply_path(parent_reply)
         )
         
         db.session.add(new_reply)
+        record_post_activity(post.id, reply_delta=1)
         db.session.commit()
         
         flash('Reply submitted successfully!', 'success')
@@ -1469,7 +1507,10 @@ def delete_reply(reply_id, post_id):
         return redirect(url_for('main.view_discussion_post', post_id=post_id))
 
     try:
-        db.session.delete(reply_to_delete)
+        reply_post_id = reply_to_delete.post_id
+        removed = delete_reply_tree(reply_to_delete)
+        # Removing replies is not new activity, so only the count changes
+        record_post_activity(reply_post_id, reply_delta=-removed, touch=False)
         db.session.commit()
         flash('Reply has been successfully deleted!', 'success')
     except Exception as e:
@@ -1498,6 +1539,7 @@ def edit_reply(reply_id, post_id):
         new_content = request.form.get('edit-content')
         if new_content:
             reply_to_edit.content = new_content
+            record_post_activity(reply_to_edit.post_id)
             db.session.commit()
             flash('Reply has been successfully updated!', 'success')
         else:
@@ -1524,7 +1566,7 @@ def download_discussion_file(filename):
         else:
             return redirect(url_for('main.view_discussion_post'))
 
-    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename, as_attachment=True)
+    return send_upload(current_app.config['UPLOAD_FOLDER'], filename, download_name(filename))
 
 @main_bp.route('/course/announcements/select_course', methods=['GET'])
 @login_required
@@ -1589,6 +1631,7 @@ def create_announcement(course_id):
         
         try:
             db.session.add(new_announcement)
+            sync_event('announcement', new_announcement)
             db.session.commit()
             flash('Announcement created successfully!', 'success')
             return redirect(url_for('main.view_announcements', course_id=course_id))
@@ -1617,6 +1660,7 @@ def edit_announcement(announcement_id):
         announcement.content = request.form.get('content')
         
         try:
+            sync_event('announcement', announcement)
             db.session.commit()
             flash('Announcement updated successfully!', 'success')
             return redirect(url_for('main.view_announcements', course_id=announcement.course_id))
@@ -1641,6 +1685,7 @@ def delete_announcement(announcement_id):
         return redirect(url_for('main.view_announcements', course_id=announcement.course_id))
 
     try:
+        remove_event('announcement', announcement.id, announcement.course_id)
         db.session.delete(announcement)
         db.session.commit()
         flash('Announcement deleted successfully!', 'success')
@@ -1660,52 +1705,7 @@ def student_progress_dashboard():
         # You could redirect them to their own dashboard or homepage
         return redirect(url_for('main.index'))
 
-    student_courses = current_user.enrolled_courses.all()
-    dashboard_data = []
-
-    for course in student_courses:
-        assignments = Assignment.query.filter_by(course_id=course.id).all()
-        quizzes = Quiz.query.filter_by(course_id=course.id).all()
-        lessons = Lesson.query.filter_by(course_id=course.id).all()
-        
-        # Get discussion activity for the student in this course
-        discussion_posts = DiscussionPost.query.filter_by(course_id=course.id, author_id=current_user.id).count()
-        discussion_replies = Reply.query.filter_by(post_id=DiscussionPost.id, author_id=current_user.id).join(DiscussionPost).filter(DiscussionPost.course_id == course.id).count()
-
-        course_assignments_data = []
-        for assignment in assignments:
-            submission = AssignmentSubmission.query.filter_by(
-                assignment_id=assignment.id,
-                student_id=current_user.id
-            ).first()
-            course_assignments_data.append({
-                'assignment': assignment,
-                'submission': submission,
-                'status': 'Graded' if submission and submission.grade is not None else 'Submitted' if submission else 'Not Submitted'
-            })
-
-        course_quizzes_data = []
-        for quiz in quizzes:
-            submission = QuizSubmission.query.filter_by(
-                quiz_id=quiz.id,
-                student_id=current_user.id
-            ).first()
-            course_quizzes_data.append({
-                'quiz': quiz,
-                'submission': submission,
-                'status': 'Graded' if submission and submission.is_graded else 'Submitted' if submission else 'Not Submitted'
-            })
-
-        dashboard_data.append({
-            'course': course,
-            'assignments': course_assignments_data,
-            'quizzes': course_quizzes_data,
-            'total_lessons': len(lessons),
-            'discussion_posts': discussion_posts,
-            'discussion_replies': discussion_replies
-        })
-
-    return render_template('student/progress_report.html', dashboard_data=dashboard_data)
+    return render_progress_html(progress_reports.get(current_user))
 
 @main_bp.route('/@me/dashboard/download/csv')
 @login_required
@@ -1716,76 +1716,7 @@ def download_progress_csv():
     if current_user.role != 'student':
         return redirect(url_for('main.index'))
 
-    student_courses = current_user.enrolled_courses.all()
-    
-    csv_output = io.StringIO()
-    writer = csv.writer(csv_output)
-    writer.writerow(['Course', 'Assignment', 'Status', 'Grade', 'Quiz', 'Quiz Score', 'Lessons Total', 'Discussion Posts', 'Discussion Replies'])
-
-    for course in student_courses:
-        assignments = Assignment.query.filter_by(course_id=course.id).all()
-        quizzes = Quiz.query.filter_by(course_id=course.id).all()
-        lessons_count = Lesson.query.filter_by(course_id=course.id).count()
-        discussion_posts = DiscussionPost.query.filter_by(course_id=course.id, author_id=current_user.id).count()
-        discussion_replies = Reply.query.filter_by(author_id=current_user.id).join(DiscussionPost).filter(DiscussionPost.course_id == course.id).count()
-
-        # Combine all items to create a single row for each course-item
-        all_items = [(a, None) for a in assignments] + [(None, q) for q in quizzes]
-        
-        for item_index, (assignment, quiz) in enumerate(all_items):
-            assignment_title = assignment.title if assignment else ""
-            assignment_status = "N/A"
-            assignment_grade = "N/A"
-            quiz_title = quiz.title if quiz else ""
-            quiz_score = "N/A"
-
-            if assignment:
-                submission = AssignmentSubmission.query.filter_by(
-                    assignment_id=assignment.id,
-                    student_id=current_user.id
-                ).first()
-                if submission:
-                    assignment_status = "Graded" if submission.grade is not None else "Submitted"
-                    assignment_grade = str(submission.grade) if submission.grade is not None else ""
-                else:
-                    assignment_status = "Not Submitted"
-
-            if quiz:
-                submission = QuizSubmission.query.filter_by(
-                    quiz_id=quiz.id,
-                    student_id=current_user.id
-                ).first()
-                if submission:
-                    quiz_score = str(submission.score)
-
-            if item_index == 0:
-                writer.writerow([
-                    course.title,
-                    assignment_title,
-                    assignment_status,
-                    assignment_grade,
-                    quiz_title,
-                    quiz_score,
-                    lessons_count,
-                    discussion_posts,
-                    discussion_replies
-                ])
-            else:
-                writer.writerow([
-                    "",  # Empty course title for subsequent rows
-                    assignment_title,
-                    assignment_status,
-                    assignment_grade,
-                    quiz_title,
-                    quiz_score,
-                    "", # Empty for subsequent rows
-                    "", # Empty for subsequent rows
-                    ""  # Empty for subsequent rows
-                ])
-
-
-    output = csv_output.getvalue()
-    return Response(output, mimetype="text/csv", headers={"Content-disposition": "attachment; filename=student_progress.csv"})
+    return stream_csv(progress_csv_rows(progress_reports.get(current_user)), 'student_progress.csv')
 
 @main_bp.route('/@me/dashboard/download/pdf')
 @login_required
@@ -1796,65 +1727,47 @@ def download_progress_pdf():
     if current_user.role != 'student':
         return redirect(url_for('main.index'))
 
-    student_courses = current_user.enrolled_courses.all()
-    dashboard_data = []
-
-    for course in student_courses:
-        assignments = Assignment.query.filter_by(course_id=course.id).all()
-        quizzes = Quiz.query.filter_by(course_id=course.id).all()
-        lessons = Lesson.query.filter_by(course_id=course.id).all()
-
-        # Get discussion activity for the student in this course
-        discussion_posts = DiscussionPost.query.filter_by(course_id=course.id, author_id=current_user.id).count()
-        discussion_replies = Reply.query.filter_by(post_id=DiscussionPost.id, author_id=current_user.id).join(DiscussionPost).filter(DiscussionPost.course_id == course.id).count()
+    html_content = render_progress_pdf_html(progress_reports.get(current_user), current_user)
+    try:
+        key = request_pdf(current_user.id, html_content, request.url_root, PDF_STYLESHEET)
+    except QueueFull:
+        flash('Many reports are being generated right now. Please try again in a minute.', 'warning')
+        return redirect(url_for('main.student_progress_dashboard'))
 
-        course_assignments_data = []
-        for assignment in assignments:
-            submission = AssignmentSubmission.query.filter_by(
-                assignment_id=assignment.id,
-                student_id=current_user.id
-            ).first()
-            course_assignments_data.append({
-                'assignment': assignment,
-                'submission': submission,
-                'status': 'Graded' if submission and submission.grade is not None else 'Submitted' if submission else 'Not Submitted'
-            })
+    # Unchanged reports are served straight from the cache
+    if get_status(current_user.id, key) == 'done':
+        return redirect(url_for('main.progress_pdf_file', key=key))
+    return render_template('student/pdf_pending.html', title='Preparing PDF', key=key)
 
-        course_quizzes_data = []
-        for quiz in quizzes:
-            submission = QuizSubmission.query.filter_by(
-                quiz_id=quiz.id,
-                student_id=current_user.id
-            ).first()
-            course_quizzes_data.append({
-                'quiz': quiz,
-                'submission': submission,
-                'status': 'Graded' if submission and submission.is_graded else 'Submitted' if submission else 'Not Submitted'
-            })
+@main_bp.route('/@me/dashboard/download/pdf/<string:key>/status')
+@login_required
+def progress_pdf_status(key):
+    """
+    Reports whether the student's PDF is still rendering, as JSON. 'unknown'
+    means no record of the render: it runs on another worker, or it was lost
+    when a worker restarted.
+    """
+    if not re.fullmatch(r'[0-9a-f]{64}', key):
+        abort(404)
+    status = get_status(current_user.id, key) or 'unknown'
+    return jsonify({
+        'status': status,
+        'url': url_for('main.progress_pdf_file', key=key) if status == 'done' else None
+    })
 
-        dashboard_data.append({
-            'course': course,
-            'assignments': course_assignments_data,
-            'quizzes': course_quizzes_data,
-            'total_lessons': len(lessons),
-            'discussion_posts': discussion_posts,
-            'discussion_replies': discussion_replies
-        })
-
-    # Render the progress data to a simple HTML template for PDF conversion
-    html_content = render_template('student/pdf_template.html', dashboard_data=dashboard_data, current_user=current_user)
-
-    # Use WeasyPrint to generate the PDF
-    pdf = HTML(string=html_content, base_url=request.url).write_pdf(stylesheets=[CSS(string='''
-        body { font-family: sans-serif; }
-        h1 { text-align: center; }
-        .course-card { margin-bottom: 20px; border: 1px solid #ccc; padding: 15px; }
-        .course-title { font-size: 1.2em; font-weight: bold; }
-        ul { list-style-type: none; padding-left: 0; }
-        li { margin-bottom: 5px; }
-    ''')])
-
-    return Response(pdf, mimetype="application/pdf", headers={"Content-disposition": "attachment; filename=student_progress.pdf"})
+@main_bp.route('/@me/dashboard/download/pdf/<string:key>')
+@login_required
+def progress_pdf_file(key):
+    """
+    Downloads a rendered progress PDF. Only the student it belongs to can fetch it.
+    """
+    if not re.fullmatch(r'[0-9a-f]{64}', key):
+        abort(404)
+    path = pdf_path(current_user.id, key)
+    if not os.path.exists(path):
+        abort(404)
+    return send_file(path, mimetype='application/pdf', as_attachment=True,
+                     download_name='student_progress.pdf', etag=key, conditional=True)
 
 @main_bp.route('/calendar')
 @login_required
@@ -1862,7 +1775,40 @@ def calendar():
     """
     Renders the calendar page for the logged-in user.
     """
-    return render_template('calendar/calendar.html')
+    ics_url = url_for('main.calendar_ics', token=get_calendar_token(current_user), _external=True)
+    return render_template('calendar/calendar.html', ics_url=ics_url)
+
+@main_bp.route('/calendar/subscription/reset', methods=['POST'])
+@login_required
+def reset_calendar_subscription():
+    """
+    Replaces the user's .ics subscription token, so any previously shared
+    subscription URL stops working.
+    """
+    reset_calendar_token(current_user)
+    flash('Your calendar subscription link has been reset. Update it in your calendar app.', 'success')
+    return redirect(url_for('main.calendar'))
+
+@main_bp.route('/calendar/<token>.ics')
+def calendar_ics(token):
+    """
+    Streams the assignment and quiz due dates of a user's courses as an
+    iCalendar feed. Calendar apps cannot log in, so the secret token in the
+    URL identifies the user.
+    """
+    user = User.query.filter_by(calendar_token=token).first()
+    if user is None:
+        abort(404)
+
+    feed = CalendarFeed(user, source_types=ICS_SOURCE_TYPES)
+    if not is_resource_modified(request.environ, etag=feed.etag):
+        response = Response(status=304)
+    else:
+        response = Response(stream_with_context(ics_lines(feed, f"{user.username} - Due Dates", request.host)),
+                            mimetype='text/calendar')
+    response.set_etag(feed.etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 @main_bp.route('/admin/general_announcements', methods=['GET', 'POST'])
 @login_required
@@ -1887,6 +1833,7 @@ def admin_general_announcements():
                 author_id=current_user.id
             )
             db.session.add(new_announcement)
+            sync_event('general_announcement', new_announcement)
             db.session.commit()
             flash('General announcement created successfully!', 'success')
             return redirect(url_for('main.admin_general_announcements'))
@@ -1908,68 +1855,33 @@ def view_general_announcement(announcement_id):
 @login_required
 def api_calendar_events():
     """
-    Returns a JSON list of all calendar events for the user's enrolled courses,
-    plus general announcements.
+    Returns a JSON list of the calendar events between the `start` and `end`
+    query parameters for the user's enrolled courses, plus general announcements.
     """
-    all_events = []
-    
-    # 1. Fetch all General Announcements
-    general_announcements = GeneralAnnouncement.query.all()
-    for ann in general_announcements:
-        all_events.append({
-            'id': f"general_announcement-{ann.id}",
-            'title': f"[General Announcement] {ann.title}",
-            'start': ann.created_at.isoformat(),
-            'end': ann.created_at.isoformat(),
-            'allDay': True,
-            'color': '#ffbe0b', # A distinct color for general announcements
-            'url': url_for('main.view_general_announcement', announcement_id=ann.id),
-            'description': ann.content
-        })
-
-    user_courses = current_user.enrolled_courses.all()
-    for course in user_courses:
-        # 2. Fetch course-specific Announcements
-        for ann in course.course_announcements:
-            all_events.append({
-                'id': f"course_announcement-{ann.id}",
-                'title': f"[{course.title}] {ann.title} (by {ann.author.username})",
-                'start': ann.created_at.isoformat(),
-                'end': ann.created_at.isoformat(),
-                'allDay': True,
-                'color': '#fb5607', # A distinct color for course announcements
-                'url': url_for('main.view_announcements', course_id=course.id), # Placeholder URL, link to the list of announcements
-                'description': ann.content
-            })
+    start, end = parse_range(request.args.get('start'), request.args.get('end'))
+    feed = CalendarFeed(current_user, start, end)
 
-        # 3. Fetch Assignments
-        for assignment in course.assignments:
-            all_events.append({
-                'id': f"assignment-{assignment.id}",
-                'title': f"[{course.title}] Due: {assignment.title}",
-                'start': assignment.due_date.isoformat(),
-                'end': assignment.due_date.isoformat(),
-                'allDay': True,
-                'color': '#ff006e', # A distinct color for assignments
-                'url': url_for('main.view_assignments', course_id=course.id, assignment_id=assignment.id),
-                'description': assignment.description
-            })
+    # Answer from the course versions alone when the client's copy is current
+    if feed.etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = jsonify(feed.events())
+    response.set_etag(feed.etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
-        # 4. Fetch Quizzes
-        for quiz in course.quizzes:
-            if quiz.due_date: # Only include quizzes with a due date
-                all_events.append({
-                    'id': f"quiz-{quiz.id}",
-                    'title': f"[{course.title}] Quiz: {quiz.title}",
-                    'start': quiz.due_date.isoformat(),
-                    'end': quiz.due_date.isoformat(),
-                    'allDay': True,
-                    'color': '#8338ec', # A distinct color for quizzes
-                    'url': url_for('main.take_quiz', course_id=course.id, quiz_id=quiz.id),
-                    'description': f"Quiz '{quiz.title}' is due."
-                })
-
-    return jsonify(all_events)
+@main_bp.route('/search')
+@login_required
+def search_content():
+    """
+    Searches the lessons, discussions and announcements of the user's
+    courses, plus general announcements, and shows ranked results.
+    """
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = 20
+    results, has_more = search(current_user, query, limit=per_page, offset=(page - 1) * per_page)
+    return render_template('search/results.html', query=query, results=results, page=page, has_more=has_more)
 
 @main_bp.route('/teacher/course/<int:course_id>/progress_report')
 @login_required
@@ -1983,41 +1895,34 @@ def teacher_progress_report(course_id):
         flash('You do not have permission to view this page.', 'danger')
         return redirect(url_for('main.dashboard'))
 
-    # Fetch all students enrolled in the course
-    # The 'enrolled_users' backref on Course provides the list of students
-    students = course.enrolled_users.all()
-    
-    # Fetch all assignments and quizzes for the course
-    assignments = course.assignments
-    quizzes = course.quizzes
-
-    # Fetch all submissions for these assignments and quizzes in one go
-    assignment_submissions = AssignmentSubmission.query.filter(
-        AssignmentSubmission.assignment_id.in_([a.id for a in assignments])
-    ).options(joinedload(AssignmentSubmission.assignment)).all()
-    
-    quiz_submissions = QuizSubmission.query.filter(
-        QuizSubmission.quiz_id.in_([q.id for q in quizzes])
-    ).options(joinedload(QuizSubmission.quiz)).all()
-
-    # Organize submission data for easy access in the template
-    progress_data = {}
-    for student in students:
-        progress_data[student.id] = {
-            'student': student,
-            'assignments': {sub.assignment_id: sub for sub in assignment_submissions if sub.student_id == student.id},
-            'quizzes': {sub.quiz_id: sub for sub in quiz_submissions if sub.student_id == student.id}
-        }
-    
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 50, type=int), 200)
+    gradebook = get_course_gradebook(course, page=page, per_page=per_page)
+
     return render_template(
         'teacher/progress_report.html',
         course=course,
-        students=students,
-        assignments=assignments,
-        quizzes=quizzes,
-        progress_data=progress_data
+        pagination=gradebook['students'],
+        students=gradebook['students'].items,
+        assignments=gradebook['assignments'],
+        quizzes=gradebook['quizzes'],
+        grades=gradebook['grades'],
+        scores=gradebook['scores']
     )
 
+@main_bp.route('/teacher/course/<int:course_id>/progress_report/download/csv')
+@login_required
+def download_gradebook_csv(course_id):
+    """
+    Streams the whole-course gradebook as CSV, one row per enrolled student.
+    """
+    course = Course.query.get_or_404(course_id)
+    if current_user.role != 'teacher' or course.teacher != current_user:
+        flash('You do not have permission to view this page.', 'danger')
+        return redirect(url_for('main.dashboard'))
+
+    return stream_csv(gradebook_rows(course), f'gradebook_course_{course.id}.csv')
+
 @main_bp.route('/admin/system_logs')
 @login_required
 def system_logs():
@@ -2056,6 +1961,17 @@ def system_logs():
 
     return render_template('admin/system_logs.html', logs=all_events)
 
+@main_bp.route('/admin/quiz_cache_stats')
+@login_required
+def quiz_cache_stats():
+    """
+    Returns the parsed-quiz cache counters for this worker process as JSON.
+    """
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Forbidden'}), 403
+
+    return jsonify(quiz_cache.stats())
+
 @main_bp.route('/admin/delete_logs', methods=['POST'])
 @login_required
 def delete_logs():
@@ -2083,6 +1999,7 @@ def delete_logs():
             #     record = Course.query.get(entry_id)
             elif model_name == 'GeneralAnnouncement':
                 record = GeneralAnnouncement.query.get(entry_id)
+                remove_event('general_announcement', entry_id)
             # elif model_name == 'Announcement':
             #     record = Announcement.query.get(entry_id)
             # elif model_name == 'Assignment':
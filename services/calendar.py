@@ -0,0 +1,309 @@
+# services/calendar.py
+
+import hashlib
+import html
+import re
+import secrets
+from datetime import datetime, timezone
+from flask import url_for
+from sqlalchemy import func, or_
+from extensions import db
+from models import Course, Enrollment, Announcement, Assignment, Quiz, GeneralAnnouncement, CalendarEvent
+
+# FullCalendar colour of each kind of event
+EVENT_COLORS = {
+    'general_announcement': '#ffbe0b',
+    'announcement': '#fb5607',
+    'assignment': '#ff006e',
+    'quiz': '#8338ec',
+}
+
+# Source types shown in the .ics subscription: due dates only
+ICS_SOURCE_TYPES = ('assignment', 'quiz')
+
+# Timeline rows fetched per database round trip while an .ics feed streams
+ICS_BATCH_SIZE = 500
+
+_TAGS = re.compile(r'<[^>]+>')
+
+
+def parse_range(start, end):
+    """
+    Parses FullCalendar's ISO `start` and `end` parameters into naive UTC
+    datetimes. A missing or unparsable bound is returned as None.
+    """
+    def parse(value):
+        if not value:
+            return None
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+
+    return parse(start), parse(end)
+
+
+def bump_calendar_version(course_id):
+    """
+    Marks a course's calendar as changed so client ETags for it are no
+    longer used. sync_event and remove_event call it; call it directly for
+    other changes that show on the calendar, such as a course rename.
+    """
+    Course.query.filter_by(id=course_id).update(
+        {'calendar_version': Course.calendar_version + 1}, synchronize_session=False
+    )
+
+
+def _event_fields(source_type, source):
+    """
+    Returns the timeline row values of a source object, or None if it has no
+    date to show (a quiz without a due date).
+    """
+    if source_type == 'assignment':
+        return dict(title=f"Due: {source.title}", description=source.description, start_time=source.due_date,
+                    course_id=source.course_id, author_id=source.course.created_by_user_id)
+    if source_type == 'quiz':
+        if source.due_date is None:
+            return None
+        return dict(title=f"Quiz: {source.title}", description=f"Quiz '{source.title}' is due.", start_time=source.due_date,
+                    course_id=source.course_id, author_id=source.course.created_by_user_id)
+    if source_type == 'announcement':
+        return dict(title=f"{source.title} (by {source.author.username})", description=source.content,
+                    start_time=source.created_at, course_id=source.course_id, author_id=source.author_id)
+    return dict(title=f"[General Announcement] {source.title}", description=source.content,
+                start_time=source.created_at, course_id=None, author_id=source.author_id)
+
+
+def sync_event(source_type, source):
+    """
+    Writes the timeline row of an assignment, quiz, announcement or general
+    announcement that was just created or edited. Call it before committing,
+    so the row is written in the same transaction.
+    """
+    # New sources need their id and created_at default
+    db.session.flush()
+    fields = _event_fields(source_type, source)
+    event = CalendarEvent.query.filter_by(source_type=source_type, source_id=source.id).first()
+    if fields is None:
+        if event is not None:
+            remove_event(source_type, source.id, event.course_id)
+        return
+
+    if event is None:
+        event = CalendarEvent(source_type=source_type, source_id=source.id)
+        db.session.add(event)
+    for name, value in fields.items():
+        setattr(event, name, value)
+    event.end_time = event.start_time
+    if event.course_id is not None:
+        bump_calendar_version(event.course_id)
+
+
+def remove_event(source_type, source_id, course_id=None):
+    """Deletes the timeline row of a source that is being deleted."""
+    CalendarEvent.query.filter_by(source_type=source_type, source_id=source_id).delete(synchronize_session=False)
+    if course_id is not None:
+        bump_calendar_version(course_id)
+
+
+def remove_course_events(course_id):
+    """
+    Deletes every timeline row of a course. Must run before the course is
+    deleted, or the ORM would orphan the rows as general events.
+    """
+    CalendarEvent.query.filter_by(course_id=course_id).delete(synchronize_session=False)
+
+
+def rebuild_calendar():
+    """
+    Rebuilds every sourced timeline row from the source tables and commits.
+    Returns the number of events written.
+    """
+    CalendarEvent.query.filter(CalendarEvent.source_type.isnot(None)).delete(synchronize_session=False)
+    written = 0
+    for source_type, model in (('assignment', Assignment), ('quiz', Quiz),
+                               ('announcement', Announcement), ('general_announcement', GeneralAnnouncement)):
+        for source in model.query.all():
+            fields = _event_fields(source_type, source)
+            if fields is not None:
+                db.session.add(CalendarEvent(source_type=source_type, source_id=source.id, end_time=fields['start_time'], **fields))
+                written += 1
+    Course.query.update({'calendar_version': Course.calendar_version + 1}, synchronize_session=False)
+    db.session.commit()
+    return written
+
+
+def _in_range(query, column, start, end):
+    if start is not None:
+        query = query.filter(column >= start)
+    if end is not None:
+        query = query.filter(column < end)
+    return query
+
+
+def _event_url(event, external=False):
+    if event.source_type == 'assignment':
+        return url_for('main.view_assignments', course_id=event.course_id, assignment_id=event.source_id, _external=external)
+    if event.source_type == 'quiz':
+        return url_for('main.take_quiz', course_id=event.course_id, quiz_id=event.source_id, _external=external)
+    if event.source_type == 'announcement':
+        return url_for('main.view_announcements', course_id=event.course_id, _external=external)
+    if event.source_type == 'general_announcement':
+        return url_for('main.view_general_announcement', announcement_id=event.source_id, _external=external)
+    return None
+
+
+class CalendarFeed:
+    """
+    The calendar events one user sees within a date window, optionally
+    limited to some source types.
+
+    Creating a feed costs two small queries: the user's courses with their
+    calendar versions, and an aggregate over the general events in the
+    window. Those make up the ETag, so an unchanged calendar can be
+    answered with a 304 before any event is loaded.
+
+    There is deliberately no Last-Modified: enrolling in a course whose
+    events are older, or leaving or deleting a course, changes the feed
+    without making any timestamp newer, so If-Modified-Since would serve
+    stale calendars. The ETag covers the set of courses.
+    """
+
+    def __init__(self, user, start=None, end=None, source_types=None):
+        self.start = start
+        self.end = end
+        self.source_types = source_types
+        self.courses = db.session.query(
+            Course.id, Course.title, Course.calendar_version
+        ).join(Enrollment, Enrollment.course_id == Course.id).filter(Enrollment.user_id == user.id).order_by(Course.id).all()
+        self._titles = {course.id: course.title for course in self.courses}
+        self.general_version = tuple(self._filtered(
+            db.session.query(func.count(CalendarEvent.id), func.max(CalendarEvent.id), func.max(CalendarEvent.updated_at))
+        ).filter(CalendarEvent.course_id.is_(None)).one())
+
+        window = (start.isoformat() if start else '', end.isoformat() if end else '')
+        state = repr((window, source_types, self.general_version, [(c.id, c.title, c.calendar_version) for c in self.courses]))
+        self.etag = hashlib.sha1(state.encode('utf-8')).hexdigest()
+
+    def _filtered(self, query):
+        query = _in_range(query, CalendarEvent.start_time, self.start, self.end)
+        if self.source_types is not None:
+            query = query.filter(CalendarEvent.source_type.in_(self.source_types))
+        return query
+
+    def query(self):
+        """
+        The timeline rows of the user's courses and the general events in
+        the window, ordered by start time, as one range query.
+        """
+        course_ids = [course.id for course in self.courses]
+        return self._filtered(
+            db.session.query(
+                CalendarEvent.id, CalendarEvent.title, CalendarEvent.description, CalendarEvent.start_time,
+                CalendarEvent.end_time, CalendarEvent.course_id, CalendarEvent.source_type, CalendarEvent.source_id,
+                CalendarEvent.updated_at
+            ).filter(or_(CalendarEvent.course_id.in_(course_ids), CalendarEvent.course_id.is_(None)))
+        ).order_by(CalendarEvent.start_time, CalendarEvent.id)
+
+    def title_of(self, event):
+        """The event title, prefixed with its course title for course events."""
+        if event.course_id is None:
+            return event.title
+        return f"[{self._titles[event.course_id]}] {event.title}"
+
+    def events(self):
+        """Returns the events as a list of FullCalendar dicts."""
+        return [{
+            'id': f"{event.source_type or 'event'}-{event.source_id or event.id}",
+            'title': self.title_of(event),
+            'start': event.start_time.isoformat(),
+            'end': event.end_time.isoformat(),
+            'allDay': True,
+            'color': EVENT_COLORS.get(event.source_type, '#3a86ff'),
+            'url': _event_url(event),
+            'description': event.description
+        } for event in self.query().all()]
+
+
+def get_calendar_token(user):
+    """
+    Returns the secret token of the user's .ics subscription URL, creating
+    (and committing) one the first time it is asked for.
+    """
+    if user.calendar_token is None:
+        reset_calendar_token(user)
+    return user.calendar_token
+
+
+def reset_calendar_token(user):
+    """Gives the user a new subscription token, so old .ics URLs stop working."""
+    user.calendar_token = secrets.token_urlsafe(32)
+    db.session.commit()
+
+
+def _ics_escape(text):
+    text = html.unescape(_TAGS.sub('', text or ''))
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def _ics_time(value):
+    # DTSTAMP must be UTC, and updated_at is stored as UTC
+    return value.strftime('%Y%m%dT%H%M%SZ')
+
+
+def _ics_local_time(value):
+    """
+    A floating date-time, shown at the same wall-clock time in every time
+    zone. Due dates are entered with datetime-local inputs and stored
+    without a zone, just as the JSON feed sends them to FullCalendar.
+    """
+    return value.strftime('%Y%m%dT%H%M%S')
+
+
+def _ics_line(line):
+    """Folds a content line to 75 octets as RFC 5545 requires."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    while encoded:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(encoded))
+        # Never split a multi-byte character
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def ics_lines(feed, calendar_name, host):
+    """
+    Yields the feed as an iCalendar document, a few lines at a time. Rows
+    are fetched in batches while the response streams.
+    """
+    yield _ics_line('BEGIN:VCALENDAR')
+    yield _ics_line('VERSION:2.0')
+    yield _ics_line('PRODID:-//LMS//Calendar//EN')
+    yield _ics_line('CALSCALE:GREGORIAN')
+    yield _ics_line(f"X-WR-CALNAME:{_ics_escape(calendar_name)}")
+    for event in feed.query().yield_per(ICS_BATCH_SIZE):
+        url = _event_url(event, external=True)
+        lines = [
+            'BEGIN:VEVENT',
+            f"UID:{event.source_type or 'event'}-{event.source_id or event.id}@{host}",
+            f"DTSTAMP:{_ics_time(event.updated_at or event.start_time)}",
+            f"DTSTART:{_ics_local_time(event.start_time)}",
+            f"DTEND:{_ics_local_time(event.end_time)}",
+            f"SUMMARY:{_ics_escape(feed.title_of(event))}",
+        ]
+        if event.description:
+            lines.append(f"DESCRIPTION:{_ics_escape(event.description)}")
+        if url:
+            lines.append(f"URL:{url}")
+        lines.append('END:VEVENT')
+        yield ''.join(_ics_line(line) for line in lines)
+    yield _ics_line('END:VCALENDAR')
@@ -0,0 +1,48 @@
+# services/dashboard.py
+
+from models import Quiz, QuizSubmission
+
+
+def get_student_dashboard_data(student):
+    """
+    Builds the per-course quiz overview shown on the student dashboard.
+
+    Enrolled courses, their quizzes and the student's submissions are each
+    fetched with a single query and joined in memory, so the page costs the
+    same number of queries no matter how many courses the student takes.
+    """
+    courses = student.enrolled_courses.all()
+    course_ids = [course.id for course in courses]
+    if not course_ids:
+        return []
+
+    quizzes = Quiz.query.filter(Quiz.course_id.in_(course_ids)).order_by(Quiz.id).all()
+    quiz_ids = [quiz.id for quiz in quizzes]
+
+    # Keep the earliest submission per quiz, matching the old `.first()` lookup
+    submissions_by_quiz = {}
+    if quiz_ids:
+        submissions = QuizSubmission.query.filter(
+            QuizSubmission.student_id == student.id,
+            QuizSubmission.quiz_id.in_(quiz_ids)
+        ).order_by(QuizSubmission.id).all()
+        for submission in submissions:
+            submissions_by_quiz.setdefault(submission.quiz_id, submission)
+
+    quizzes_by_course = {course_id: [] for course_id in course_ids}
+    for quiz in quizzes:
+        submission = submissions_by_quiz.get(quiz.id)
+        total_points = quiz.total_points
+
+        quizzes_by_course[quiz.course_id].append({
+            'id': quiz.id,
+            'title': quiz.title,
+            'is_completed': submission is not None,
+            'score': submission.score if submission else None,
+            'submission_id': submission.id if submission else None,
+            'total_questions': quiz.question_count,
+            'total_points': total_points,
+            'percentage': (submission.score / total_points * 100) if submission and total_points > 0 else None
+        })
+
+    return [{'course': course, 'quizzes': quizzes_by_course[course.id]} for course in courses]
@@ -0,0 +1,162 @@
+# services/discussions.py
+
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import joinedload
+from extensions import db
+from models import DiscussionPost, Reply
+from services.search import remove_reply_documents
+
+# Width of one ancestor id in Reply.path
+PATH_DIGITS = 10
+
+
+class ReplyNode:
+    """
+    A reply with its parent node and its child nodes, assembled in memory
+    so templates can walk a thread without lazy loads.
+    """
+    __slots__ = ('reply', 'parent', 'children')
+
+    def __init__(self, reply, parent=None):
+        self.reply = reply
+        self.parent = parent
+        self.children = []
+
+
+def reply_path(parent):
+    """The path of a new reply under `parent` (None for a top-level reply)."""
+    if parent is None:
+        return ''
+    return f"{parent.path}{parent.id:0{PATH_DIGITS}d}/"
+
+
+def in_subtree(reply):
+    """
+    A filter matching every descendant of `reply` (not the reply itself).
+
+    Descendant paths all start with the reply's own path plus its id, which
+    ends in '/'. Replacing that '/' with the next character, '0', gives an
+    upper bound, so the prefix match is a range scan on ix_replies_path.
+    """
+    prefix = reply_path(reply)
+    return and_(Reply.path >= prefix, Reply.path < prefix[:-1] + '0')
+
+
+def count_descendants(reply):
+    """The number of replies nested under `reply`, at any depth."""
+    return db.session.query(func.count(Reply.id)).filter(in_subtree(reply)).scalar()
+
+
+def delete_reply_tree(reply):
+    """
+    Deletes a reply and all of its descendants and returns how many replies
+    were removed. The descendants go in one range delete instead of the ORM
+    cascade walking child_replies one level at a time.
+    """
+    # A bulk delete fires no ORM events, so the search documents go explicitly
+    remove_reply_documents(in_subtree(reply))
+    removed = Reply.query.filter(in_subtree(reply)).delete(synchronize_session=False)
+    db.session.delete(reply)
+    return removed + 1
+
+
+def record_post_activity(post_id, reply_delta=0, touch=True):
+    """
+    Applies a reply change to a post's reply_count and last_activity_at in a
+    single UPDATE, so concurrent replies cannot lose a count. Call it before
+    committing the reply change.
+    """
+    values = {'reply_count': DiscussionPost.reply_count + reply_delta}
+    if touch:
+        values['last_activity_at'] = datetime.utcnow()
+    DiscussionPost.query.filter_by(id=post_id).update(values, synchronize_session=False)
+
+
+def encode_cursor(moment, row_id):
+    """The cursor of the page that continues after the row at (moment, row_id)."""
+    return f"{moment.isoformat()}_{row_id}"
+
+
+def decode_cursor(cursor):
+    """Returns the (moment, id) position of a cursor, or None if it is missing or invalid."""
+    if not cursor:
+        return None
+    moment, _, row_id = cursor.rpartition('_')
+    try:
+        return datetime.fromisoformat(moment), int(row_id)
+    except ValueError:
+        return None
+
+
+def get_post_page(course_id, sort='newest', after=None, limit=20):
+    """
+    Returns (posts, next_cursor) for one page of a course's discussion board.
+
+    Posts are ordered newest first by created_at, or by last_activity_at when
+    `sort` is 'active', with id as the tie-breaker. Pages are keyset based:
+    the cursor holds the last post's position, so every page is one indexed
+    range scan however far down the board it is. Authors are joined in.
+    """
+    order_column = DiscussionPost.last_activity_at if sort == 'active' else DiscussionPost.created_at
+    query = DiscussionPost.query.options(joinedload(DiscussionPost.author)).filter(DiscussionPost.course_id == course_id)
+    position = decode_cursor(after)
+    if position is not None:
+        moment, post_id = position
+        query = query.filter(or_(
+            order_column < moment,
+            and_(order_column == moment, DiscussionPost.id < post_id)
+        ))
+    posts = query.order_by(order_column.desc(), DiscussionPost.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(posts) > limit:
+        last = posts[limit - 1]
+        next_cursor = encode_cursor(last.last_activity_at if sort == 'active' else last.created_at, last.id)
+    return posts[:limit], next_cursor
+
+
+def get_reply_page(post_id, after=None, limit=20):
+    """
+    Returns (nodes, next_cursor) for one page of a discussion thread.
+
+    `nodes` holds up to `limit` top-level replies after the `after` cursor,
+    oldest first, each with its whole subtree. `next_cursor` is None on the
+    last page. The page takes two queries whatever the size of the thread:
+    one for the top-level replies and one for the subtrees of just those
+    replies (a range on Reply.path each), both with their authors joined in.
+    """
+    roots_query = Reply.query.options(joinedload(Reply.author)).filter(
+        Reply.post_id == post_id, Reply.parent_reply_id.is_(None)
+    )
+    position = decode_cursor(after)
+    if position is not None:
+        created_at, reply_id = position
+        roots_query = roots_query.filter(or_(
+            Reply.created_at > created_at,
+            and_(Reply.created_at == created_at, Reply.id > reply_id)
+        ))
+    roots = roots_query.order_by(Reply.created_at, Reply.id).limit(limit + 1).all()
+
+    next_cursor = encode_cursor(roots[limit - 1].created_at, roots[limit - 1].id) if len(roots) > limit else None
+    roots = roots[:limit]
+    if not roots:
+        return [], None
+
+    nested = Reply.query.options(joinedload(Reply.author)).filter(
+        or_(*[in_subtree(root) for root in roots])
+    ).order_by(Reply.created_at, Reply.id).all()
+    children = defaultdict(list)
+    for reply in nested:
+        children[reply.parent_reply_id].append(reply)
+
+    nodes = [ReplyNode(reply) for reply in roots]
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        for child in children.get(node.reply.id, ()):
+            child_node = ReplyNode(child, node)
+            node.children.append(child_node)
+            stack.append(child_node)
+    return nodes, next_cursor
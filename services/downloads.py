@@ -0,0 +1,95 @@
+# services/downloads.py
+
+import mimetypes
+import os
+import re
+import unicodedata
+from datetime import datetime, timezone
+from urllib.parse import quote
+from flask import abort, current_app, send_file
+from werkzeug.security import safe_join
+
+# Blob store names are the SHA-256 of the content plus the original extension
+BLOB_NAME = re.compile(r'^([0-9a-f]{64})(\.[A-Za-z0-9]+)?$')
+
+# Types the browser plays or shows in place; everything else is offered as a download
+INLINE_TYPES = ('video/', 'audio/', 'image/')
+
+# Types within those that can carry script, so they are never shown in place
+SCRIPTABLE_TYPES = {'image/svg+xml', 'image/svg', 'text/html', 'application/xhtml+xml', 'application/xml', 'text/xml'}
+
+# Blobs never change under their name, so browsers may keep them for a year
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def send_upload(folder, filename, download_name=None):
+    """
+    Sends a stored upload with byte-range (206) and conditional request
+    support, so video seeking fetches only the requested bytes and repeat
+    views revalidate with a 304.
+
+    Blob store files get their content hash as a strong ETag and are marked
+    immutable, so the browser serves them from cache without asking again.
+    With SENDFILE_BACKEND set, the bytes are handed off to the front-end
+    server instead of streaming through Python.
+    """
+    path = safe_join(folder, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    as_attachment = mimetype in SCRIPTABLE_TYPES or not mimetype.startswith(INLINE_TYPES)
+    download_name = download_name or filename
+    blob = BLOB_NAME.match(filename)
+    etag = blob.group(1) if blob else True
+    max_age = IMMUTABLE_MAX_AGE if blob else None
+
+    if current_app.config.get('SENDFILE_BACKEND') == 'x-accel':
+        response = _accel_redirect(path, mimetype, as_attachment, download_name)
+        if blob:
+            response.set_etag(etag)
+            response.cache_control.max_age = max_age
+    else:
+        # Handles Range, If-Range, If-None-Match and If-Modified-Since, and
+        # switches to X-Sendfile when USE_X_SENDFILE is on
+        response = send_file(path, mimetype=mimetype, as_attachment=as_attachment,
+                             download_name=download_name, conditional=True,
+                             etag=etag, max_age=max_age)
+
+    # Uploads sit behind a login, so shared caches must not keep them
+    response.cache_control.public = False
+    response.cache_control.private = True
+    if blob:
+        response.cache_control.immutable = True
+    # Anyone logged in can upload, so nothing shown in place may be sniffed
+    # into HTML or run script on the app origin
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    if not as_attachment:
+        response.headers['Content-Security-Policy'] = 'sandbox'
+    return response
+
+
+def _accel_redirect(path, mimetype, as_attachment, download_name):
+    """
+    Builds an empty response telling nginx to serve `path` from its internal
+    location, which takes care of ranges and conditional requests itself.
+    """
+    uploads_root = os.path.join(current_app.root_path, 'static', 'uploads')
+    relative = os.path.relpath(path, uploads_root).replace(os.sep, '/')
+
+    response = current_app.response_class(mimetype=mimetype)
+    response.headers['X-Accel-Redirect'] = current_app.config['ACCEL_REDIRECT_PREFIX'].rstrip('/') + '/' + relative
+    response.headers.set('Content-Disposition', 'attachment' if as_attachment else 'inline', **_filename_options(download_name))
+    response.last_modified = datetime.fromtimestamp(os.path.getmtime(path), timezone.utc)
+    return response
+
+
+def _filename_options(download_name):
+    # Original upload names may be non-ASCII; send an ASCII fallback plus the
+    # RFC 5987 encoded name, as send_file does
+    try:
+        download_name.encode('ascii')
+    except UnicodeEncodeError:
+        ascii_name = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        return {'filename': ascii_name, 'filename*': f"UTF-8''{quote(download_name, safe='!#$&+-.^_`|~')}"}
+    return {'filename': download_name}
@@ -0,0 +1,101 @@
+# services/gradebook.py
+
+from sqlalchemy import func
+from extensions import db
+from models import Assignment, AssignmentSubmission, Quiz, QuizSubmission, GradebookEntry
+
+
+def _columns(item_type):
+    """
+    Returns the submission model of an item type with its id, item id,
+    student id, score and graded columns.
+    """
+    if item_type == 'assignment':
+        return (AssignmentSubmission, AssignmentSubmission.id, AssignmentSubmission.assignment_id,
+                AssignmentSubmission.student_id, AssignmentSubmission.grade, AssignmentSubmission.grade.isnot(None))
+    return (QuizSubmission, QuizSubmission.id, QuizSubmission.quiz_id,
+            QuizSubmission.student_id, QuizSubmission.score, QuizSubmission.is_graded)
+
+
+def refresh_entry(item_type, item, student_id):
+    """
+    Recomputes one student's gradebook entry for an assignment or quiz from
+    their submissions to it. Call it before committing the change that
+    prompted it, so the entry is written in the same transaction.
+    """
+    _, submission_id, item_id, student, score, graded = _columns(item_type)
+    attempts, latest_id = db.session.query(func.count(submission_id), func.max(submission_id)).filter(
+        item_id == item.id, student == student_id
+    ).one()
+
+    entry = GradebookEntry.query.filter_by(student_id=student_id, item_type=item_type, item_id=item.id).first()
+    if latest_id is None:
+        if entry is not None:
+            db.session.delete(entry)
+        return
+
+    latest_score, is_graded = db.session.query(score, graded).filter(submission_id == latest_id).one()
+    if entry is None:
+        entry = GradebookEntry(course_id=item.course_id, student_id=student_id, item_type=item_type, item_id=item.id)
+        db.session.add(entry)
+    entry.submission_id = latest_id
+    entry.score = latest_score
+    entry.attempts = attempts
+    entry.status = 'Graded' if is_graded else 'Submitted'
+
+
+def rebuild_item(item_type, item):
+    """
+    Rebuilds every entry of one assignment or quiz from a grouped query, for
+    changes that touch all of its submissions at once, such as a regrade.
+    """
+    model, submission_id, item_id, student, score, graded = _columns(item_type)
+    GradebookEntry.query.filter_by(item_type=item_type, item_id=item.id).delete(synchronize_session=False)
+
+    latest = db.session.query(
+        student.label('student_id'),
+        func.count(submission_id).label('attempts'),
+        func.max(submission_id).label('latest_id')
+    ).filter(item_id == item.id).group_by(student).subquery()
+    rows = db.session.query(latest.c.student_id, latest.c.attempts, latest.c.latest_id, score, graded).select_from(
+        model
+    ).join(latest, submission_id == latest.c.latest_id).all()
+
+    db.session.add_all([
+        GradebookEntry(
+            course_id=item.course_id,
+            student_id=row_student_id,
+            item_type=item_type,
+            item_id=item.id,
+            submission_id=latest_id,
+            score=latest_score,
+            attempts=attempts,
+            status='Graded' if is_graded else 'Submitted'
+        )
+        for row_student_id, attempts, latest_id, latest_score, is_graded in rows
+    ])
+    return len(rows)
+
+
+def remove_entries(item_type, item_id):
+    """Deletes the entries of an assignment or quiz that is being deleted."""
+    GradebookEntry.query.filter_by(item_type=item_type, item_id=item_id).delete(synchronize_session=False)
+
+
+def remove_course_entries(course_id):
+    """Deletes every entry of a course that is being deleted, assignments and quizzes alike."""
+    GradebookEntry.query.filter_by(course_id=course_id).delete(synchronize_session=False)
+
+
+def rebuild_gradebook():
+    """
+    Rebuilds the whole gradebook from the submission tables and commits.
+    Returns the number of entries written.
+    """
+    written = 0
+    for assignment in db.session.query(Assignment.id, Assignment.course_id).all():
+        written += rebuild_item('assignment', assignment)
+    for quiz in db.session.query(Quiz.id, Quiz.course_id).all():
+        written += rebuild_item('quiz', quiz)
+    db.session.commit()
+    return written
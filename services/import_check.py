@@ -0,0 +1,58 @@
+# services/import_check.py
+
+import re
+import subprocess
+import sys
+
+# Heavy optional dependencies that must only be loaded by the code paths that use them
+LAZY_MODULES = ('weasyprint', 'cairocffi', 'pydyf', 'fontTools', 'tinycss2', 'cssselect2')
+
+# Imports the app exactly the way a gunicorn worker does (see wsgi.py)
+STARTUP_CODE = 'from app import create_app; create_app()'
+
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)')
+
+
+def profile_startup(cwd=None):
+    """
+    Boots the app in a fresh interpreter under `python -X importtime` and
+    returns a list of (module, cumulative_us, depth) tuples in import order.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+        cwd=cwd, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"App failed to start: {result.stderr.strip().splitlines()[-1:]}")
+
+    modules = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            _, cumulative, indent, module = match.groups()
+            modules.append((module, int(cumulative), len(indent) // 2))
+    return modules
+
+
+def check_startup(budget_ms, cwd=None):
+    """
+    Profiles app startup and returns (total_ms, problems, slowest).
+
+    `problems` lists every lazy-only module that was imported at startup and
+    a note if the total import time exceeds `budget_ms`. `slowest` holds the
+    ten top-level imports with the largest cumulative time.
+    """
+    modules = profile_startup(cwd)
+    top_level = [(module, cumulative) for module, cumulative, depth in modules if depth == 0]
+    total_ms = sum(cumulative for _, cumulative in top_level) / 1000
+
+    problems = []
+    loaded = {module.split('.')[0] for module, _, _ in modules}
+    for module in LAZY_MODULES:
+        if module in loaded:
+            problems.append(f"'{module}' is imported at startup; import it where it is used instead.")
+    if total_ms > budget_ms:
+        problems.append(f"Startup imports took {total_ms:.0f} ms, over the {budget_ms} ms budget.")
+
+    slowest = sorted(top_level, key=lambda item: item[1], reverse=True)[:10]
+    return total_ms, problems, slowest
@@ -0,0 +1,304 @@
+# services/media.py
+
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from extensions import db
+from models import MediaJob
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Ids of the jobs waiting in or running on this process's pool
+_submitted = set()
+_sweeper = None
+
+# A running job writes a heartbeat every HEARTBEAT_INTERVAL; one that has not
+# for STALE_AFTER lost its worker and is re-queued by the next sweep
+HEARTBEAT_INTERVAL = timedelta(seconds=30)
+STALE_AFTER = timedelta(minutes=2)
+SWEEP_INTERVAL = timedelta(minutes=1)
+
+
+def probe_duration(video_path):
+    """
+    Returns the duration of a media file in seconds, or None if it cannot be read.
+    """
+    try:
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+             '-of', 'default=noprint_wrappers=1:nokey=1', video_path],
+            check=True, capture_output=True, text=True
+        )
+        return float(result.stdout.strip())
+    except (FileNotFoundError, subprocess.CalledProcessError, ValueError):
+        return None
+
+
+def convert_video_to_mp4(input_path, output_path, on_progress=None):
+    """
+    Converts a video file to a web-friendly MP4 format using FFmpeg.
+    
+    Args:
+        input_path (str): The path to the input video file.
+        output_path (str): The desired path for the output MP4 file.
+        on_progress (callable): Optional callback receiving the percentage done (0-100).
+        
+    Returns:
+        bool: True if the conversion was successful, False otherwise.
+    """
+    duration = probe_duration(input_path) if on_progress else None
+    command = [
+        'ffmpeg',
+        '-i', input_path,  # Input file
+        '-vcodec', 'libx264',  # Video codec
+        '-acodec', 'aac',    # Audio codec
+        '-strict', 'experimental', # Required for some AAC encoders
+        '-movflags', 'faststart', # Optimizes for web streaming
+        '-progress', 'pipe:1', '-nostats', '-loglevel', 'error', # Machine-readable progress on stdout
+        '-y', output_path # Overwrite output file if it exists
+    ]
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    except FileNotFoundError as e:
+        print(f"Error during FFmpeg conversion: {e}")
+        return False
+
+    errors = deque(maxlen=20)
+    for line in process.stdout:
+        key, sep, value = line.strip().partition('=')
+        if not sep:
+            errors.append(line.strip())
+        elif key == 'out_time_ms' and duration and on_progress:
+            try:
+                # Despite the name, FFmpeg reports out_time_ms in microseconds
+                on_progress(min(99, int(int(value) / 1000000 / duration * 100)))
+            except ValueError:
+                pass
+    process.wait()
+
+    if process.returncode != 0:
+        print(f"Error during FFmpeg conversion: {' '.join(errors)}")
+        return False
+    return True
+
+def extract_video_thumbnail(video_path, thumbnail_path):
+    """
+    Extracts a single frame from a video file using FFmpeg and saves it as a JPEG.
+    
+    Args:
+        video_path (str): The path to the input video file.
+        thumbnail_path (str): The desired path for the output thumbnail image.
+        
+    Returns:
+        bool: True if the thumbnail extraction was successful, False otherwise.
+    """
+    try:
+        command = [
+            'ffmpeg',
+            '-i', video_path,
+            '-ss', '00:00:03.000',  # Grab frame at 3 seconds
+            '-vframes', '1',
+            '-y', thumbnail_path
+        ]
+        subprocess.run(command, check=True, capture_output=True)
+        return True
+    except (FileNotFoundError, subprocess.CalledProcessError) as e:
+        print(f"Error extracting thumbnail: {e}")
+        return False
+
+
+def _get_executor(app):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config.get('MEDIA_WORKERS', 1),
+                thread_name_prefix='media-worker'
+            )
+        return _executor
+
+
+def shutdown_workers():
+    """
+    Waits for all submitted jobs to finish and stops the worker pool.
+    """
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def enqueue_transcode(source_filename, user_id):
+    """
+    Records a transcode job for an uploaded video and hands it to the local worker pool.
+    The request returns immediately; the job row tracks progress from here on.
+    """
+    job = MediaJob(source_filename=source_filename, created_by_user_id=user_id)
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    with _executor_lock:
+        _submitted.add(job.id)
+    _get_executor(app).submit(_run_job, app, job.id)
+    return job
+
+
+def start_media_workers(app):
+    """
+    Starts this process's sweeper thread, which re-submits queued jobs and
+    jobs whose worker stopped sending heartbeats, once at startup and then
+    every SWEEP_INTERVAL. Call it once per worker process (see wsgi.py), so
+    jobs left behind by a worker that died are picked up without anyone
+    having to run a command.
+    """
+    global _sweeper
+    with _executor_lock:
+        if _sweeper is not None:
+            return
+        _sweeper = threading.Thread(target=_sweep, args=(app,), name='media-sweeper', daemon=True)
+    _sweeper.start()
+
+
+def _sweep(app):
+    while True:
+        try:
+            resume_pending_jobs(app)
+        except Exception as e:
+            print(f"Error resuming media jobs: {e}")
+        time.sleep(SWEEP_INTERVAL.total_seconds())
+
+
+def resume_pending_jobs(app):
+    """
+    Re-queues running jobs whose heartbeat is older than STALE_AFTER, then
+    submits every queued job not already waiting in this process's pool.
+    Returns the number of jobs submitted.
+
+    Several workers may do this at once: re-queueing is a single conditional
+    UPDATE, and _run_job claims a job with another, so each job still runs
+    exactly once.
+    """
+    with app.app_context():
+        try:
+            cutoff = datetime.utcnow() - STALE_AFTER
+            MediaJob.query.filter(MediaJob.status == 'running', MediaJob.heartbeat_at < cutoff).update(
+                {'status': 'queued', 'progress': 0, 'heartbeat_at': None}, synchronize_session=False
+            )
+            db.session.commit()
+            job_ids = [job_id for (job_id,) in db.session.query(MediaJob.id).filter_by(status='queued').order_by(MediaJob.id)]
+        finally:
+            db.session.remove()
+
+    executor = _get_executor(app)
+    submitted = 0
+    for job_id in job_ids:
+        with _executor_lock:
+            if job_id in _submitted:
+                continue
+            _submitted.add(job_id)
+        executor.submit(_run_job, app, job_id)
+        submitted += 1
+    return submitted
+
+
+def _beat(app, job_id, stop):
+    # Runs beside a transcode and proves to other workers that the job is alive
+    while not stop.wait(HEARTBEAT_INTERVAL.total_seconds()):
+        with app.app_context():
+            try:
+                MediaJob.query.filter_by(id=job_id, status='running').update(
+                    {'heartbeat_at': datetime.utcnow()}, synchronize_session=False
+                )
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error recording media job heartbeat: {e}")
+            finally:
+                db.session.remove()
+
+
+def _run_job(app, job_id):
+    try:
+        _claim_and_run(app, job_id)
+    finally:
+        with _executor_lock:
+            _submitted.discard(job_id)
+
+
+def _claim_and_run(app, job_id):
+    with app.app_context():
+        # Claim the job atomically so that only one worker ever runs it
+        now = datetime.utcnow()
+        claimed = MediaJob.query.filter_by(id=job_id, status='queued').update(
+            {'status': 'running', 'started_at': now, 'heartbeat_at': now}, synchronize_session=False
+        )
+        db.session.commit()
+        if not claimed:
+            db.session.remove()
+            return
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=_beat, args=(app, job_id, stop), name='media-heartbeat', daemon=True)
+        heartbeat.start()
+        job = MediaJob.query.get(job_id)
+        try:
+            _transcode(app, job)
+        except Exception as e:
+            db.session.rollback()
+            job = MediaJob.query.get(job_id)
+            job.status = 'failed'
+            job.error = str(e)
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+        finally:
+            stop.set()
+            heartbeat.join()
+            db.session.remove()
+
+
+def _transcode(app, job):
+    upload_folder = app.config['UPLOAD_FOLDERS']
+    source_path = os.path.join(upload_folder, job.source_filename)
+    name, ext = os.path.splitext(job.source_filename)
+    output_filename = f"{name}.mp4" if ext.lower() != '.mp4' else f"{name}_web.mp4"
+    output_path = os.path.join(upload_folder, output_filename)
+
+    last_reported = [0]
+
+    def report(percent):
+        # Only write to the database when progress moves noticeably
+        if percent - last_reported[0] >= 5:
+            last_reported[0] = percent
+            job.progress = percent
+            db.session.commit()
+
+    if not convert_video_to_mp4(source_path, output_path, on_progress=report):
+        # The original upload keeps being served, so a failed transcode is not fatal
+        job.status = 'failed'
+        job.error = 'Video conversion failed.'
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        return
+
+    thumbnail_filename = f"{name}_thumb.jpg"
+    if extract_video_thumbnail(output_path, os.path.join(upload_folder, thumbnail_filename)):
+        job.thumbnail_filename = thumbnail_filename
+
+    job.output_filename = output_filename
+    job.status = 'done'
+    job.progress = 100
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+    try:
+        os.remove(source_path) # The stable media URL now points at the MP4
+    except OSError as e:
+        print(f"Error removing original upload: {e}")
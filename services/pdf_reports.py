@@ -0,0 +1,163 @@
+# services/pdf_reports.py
+
+import glob
+import hashlib
+import os
+import threading
+from flask import current_app
+from services.pdf_worker import render_pdf
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Jobs submitted from this process that have not finished, by cache key
+_pending = {}
+
+
+class QueueFull(Exception):
+    """Raised when the rendering queue already holds PDF_QUEUE_SIZE jobs."""
+
+
+def _get_executor(app):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Imported on first render so web workers that never build a PDF skip them
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # Spawned rather than forked so workers do not inherit the web
+            # worker's threads, sockets and database connections
+            _executor = ProcessPoolExecutor(
+                max_workers=app.config.get('PDF_WORKERS', 2),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor
+
+
+def shutdown_workers():
+    """
+    Waits for all submitted renders to finish and stops the process pool.
+    """
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def report_key(html):
+    """
+    The cache key of a report: a hash of its rendered HTML, which changes
+    whenever any of the report data (or the template) does.
+    """
+    return hashlib.sha256(html.encode('utf-8')).hexdigest()
+
+
+def pdf_path(owner_id, key):
+    return os.path.join(current_app.config['PDF_CACHE_FOLDER'], f"{owner_id}_{key}.pdf")
+
+
+def failed_path(owner_id, key):
+    """
+    The marker file recording that a render failed. Kept on disk next to the
+    PDFs, so every worker process sees the failure, not just the one that
+    submitted the render.
+    """
+    return os.path.join(current_app.config['PDF_CACHE_FOLDER'], f"{owner_id}_{key}.failed")
+
+
+def get_status(owner_id, key):
+    """
+    Returns 'done', 'pending', 'failed' or None if this key is unknown.
+    Done and failed renders are read from disk; a job still rendering in
+    another worker process shows as unknown.
+    """
+    if os.path.exists(pdf_path(owner_id, key)):
+        return 'done'
+    if os.path.exists(failed_path(owner_id, key)):
+        return 'failed'
+    with _executor_lock:
+        if key in _pending:
+            return 'pending'
+    return None
+
+
+def request_pdf(owner_id, html, base_url, stylesheet):
+    """
+    Makes sure a PDF of `html` exists or is being rendered and returns its key.
+
+    A PDF already rendered from identical HTML is reused as is. Otherwise the
+    render is handed to the process pool and this returns immediately, so
+    WeasyPrint never runs on a request worker. Raises QueueFull when
+    PDF_QUEUE_SIZE renders are already waiting.
+    """
+    key = report_key(html)
+    output_path = pdf_path(owner_id, key)
+    if os.path.exists(output_path):
+        return key
+
+    app = current_app._get_current_object()
+    with _executor_lock:
+        if key in _pending:
+            return key
+        if len(_pending) >= app.config.get('PDF_QUEUE_SIZE', 8):
+            raise QueueFull()
+        _pending[key] = None
+
+    # A new attempt clears the owner's earlier failures, this one's included
+    marker_path = failed_path(owner_id, key)
+    for stale in glob.glob(os.path.join(os.path.dirname(marker_path), f"{owner_id}_*.failed")):
+        try:
+            os.remove(stale)
+        except OSError:
+            pass
+
+    from concurrent.futures.process import BrokenProcessPool
+
+    executor = _get_executor(app)
+    try:
+        future = executor.submit(render_pdf, html, base_url, stylesheet, output_path)
+    except BrokenProcessPool as e:
+        _discard_executor(executor)
+        _record_failure(key, marker_path, e)
+        return key
+    except Exception:
+        with _executor_lock:
+            _pending.pop(key, None)
+        raise
+
+    def _finished(done):
+        error = done.exception()
+        if isinstance(error, BrokenProcessPool):
+            # A pool process died (out of memory, a crash in WeasyPrint); the
+            # pool refuses all further work, so the next render builds a new one
+            _discard_executor(executor)
+        if error is not None:
+            _record_failure(key, marker_path, error)
+        else:
+            with _executor_lock:
+                _pending.pop(key, None)
+
+    future.add_done_callback(_finished)
+    return key
+
+
+def _discard_executor(executor):
+    global _executor
+    with _executor_lock:
+        if _executor is not executor:
+            return
+        _executor = None
+    executor.shutdown(wait=False)
+
+
+def _record_failure(key, marker_path, error):
+    print(f"Error rendering PDF {key}: {error}")
+    try:
+        with open(marker_path, 'w') as marker:
+            marker.write(str(error))
+    except OSError as e:
+        print(f"Error recording PDF failure {key}: {e}")
+    with _executor_lock:
+        _pending.pop(key, None)
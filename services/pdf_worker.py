@@ -0,0 +1,31 @@
+# services/pdf_worker.py
+#
+# Runs inside the PDF rendering processes. Kept free of Flask and model
+# imports so each worker process starts quickly.
+
+import glob
+import os
+
+
+def render_pdf(html, base_url, stylesheet, output_path):
+    """
+    Lays out `html` with WeasyPrint and writes the PDF to `output_path`.
+
+    The file is written under a temporary name and renamed into place, so a
+    reader never sees a half-written PDF. Older PDFs cached for the same
+    owner (same name prefix) are removed once the new one is in place.
+    """
+    from weasyprint import HTML, CSS
+
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    HTML(string=html, base_url=base_url).write_pdf(temp_path, stylesheets=[CSS(string=stylesheet)])
+    os.replace(temp_path, output_path)
+
+    owner_prefix = os.path.basename(output_path).split('_', 1)[0]
+    for stale in glob.glob(os.path.join(os.path.dirname(output_path), f"{owner_prefix}_*.pdf")):
+        if stale != output_path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+    return output_path
@@ -0,0 +1,255 @@
+# services/progress.py
+
+import threading
+import time
+from flask import render_template
+from sqlalchemy import and_, func
+from extensions import db
+from models import User, Course, Enrollment, Assignment, Quiz, Lesson, DiscussionPost, Reply, GradebookEntry
+
+
+def _counts_by_course(query):
+    return {course_id: count for course_id, count in query.all()}
+
+
+def get_student_progress(student):
+    """
+    Builds a student's per-course progress report from six queries, whatever
+    the number of courses or items.
+
+    Assignments and quizzes come back as lightweight rows joined to the
+    student's gradebook entries (their latest submission), and lesson and
+    discussion counts are computed in SQL, so no lesson content or other
+    large text column is loaded.
+    """
+    courses = db.session.query(Course.id, Course.title).join(
+        Enrollment, Enrollment.course_id == Course.id
+    ).filter(Enrollment.user_id == student.id).order_by(Course.id).all()
+    course_ids = [course.id for course in courses]
+    if not course_ids:
+        return []
+
+    # Latest submission per item, read from the materialized gradebook
+    assignment_entry = and_(
+        GradebookEntry.item_type == 'assignment',
+        GradebookEntry.item_id == Assignment.id,
+        GradebookEntry.student_id == student.id
+    )
+    assignments = db.session.query(
+        Assignment.id,
+        Assignment.course_id,
+        Assignment.title,
+        Assignment.due_date,
+        GradebookEntry.submission_id,
+        GradebookEntry.score.label('grade'),
+        GradebookEntry.status
+    ).outerjoin(GradebookEntry, assignment_entry).filter(
+        Assignment.course_id.in_(course_ids)
+    ).order_by(Assignment.id).all()
+
+    quiz_entry = and_(
+        GradebookEntry.item_type == 'quiz',
+        GradebookEntry.item_id == Quiz.id,
+        GradebookEntry.student_id == student.id
+    )
+    quizzes = db.session.query(
+        Quiz.id,
+        Quiz.course_id,
+        Quiz.title,
+        GradebookEntry.submission_id,
+        GradebookEntry.score,
+        GradebookEntry.status
+    ).outerjoin(GradebookEntry, quiz_entry).filter(
+        Quiz.course_id.in_(course_ids)
+    ).order_by(Quiz.id).all()
+
+    lesson_counts = _counts_by_course(
+        db.session.query(Lesson.course_id, func.count(Lesson.id)).filter(
+            Lesson.course_id.in_(course_ids)
+        ).group_by(Lesson.course_id)
+    )
+    post_counts = _counts_by_course(
+        db.session.query(DiscussionPost.course_id, func.count(DiscussionPost.id)).filter(
+            DiscussionPost.course_id.in_(course_ids),
+            DiscussionPost.author_id == student.id
+        ).group_by(DiscussionPost.course_id)
+    )
+    reply_counts = _counts_by_course(
+        db.session.query(DiscussionPost.course_id, func.count(Reply.id)).join(
+            DiscussionPost, Reply.post_id == DiscussionPost.id
+        ).filter(
+            DiscussionPost.course_id.in_(course_ids),
+            Reply.author_id == student.id
+        ).group_by(DiscussionPost.course_id)
+    )
+
+    report = {course.id: {
+        'course': course,
+        'assignments': [],
+        'quizzes': [],
+        'total_lessons': lesson_counts.get(course.id, 0),
+        'discussion_posts': post_counts.get(course.id, 0),
+        'discussion_replies': reply_counts.get(course.id, 0)
+    } for course in courses}
+    for assignment in assignments:
+        report[assignment.course_id]['assignments'].append({
+            'assignment': assignment,
+            'status': assignment.status or 'Not Submitted'
+        })
+    for quiz in quizzes:
+        report[quiz.course_id]['quizzes'].append({
+            'quiz': quiz,
+            'status': quiz.status or 'Not Submitted'
+        })
+    return list(report.values())
+
+
+class ProgressReportCache:
+    """
+    A process-local cache of built progress reports, keyed by student id.
+
+    Entries expire after `ttl` seconds, so viewing the report and then
+    downloading it as CSV and PDF costs one build. A student's own
+    submissions invalidate their entry straight away; grades entered by a
+    teacher show up once the entry expires.
+    """
+
+    def __init__(self, ttl=60, maxsize=256):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, student):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(student.id)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+
+        report = get_student_progress(student)
+
+        with self._lock:
+            if len(self._entries) >= self.maxsize:
+                # Drop expired entries first, then the oldest if still full
+                self._entries = {key: value for key, value in self._entries.items() if value[0] > now}
+                if len(self._entries) >= self.maxsize:
+                    del self._entries[min(self._entries, key=lambda key: self._entries[key][0])]
+            self._entries[student.id] = (now + self.ttl, report)
+        return report
+
+    def invalidate(self, student_id):
+        with self._lock:
+            self._entries.pop(student_id, None)
+
+
+progress_reports = ProgressReportCache()
+
+
+def render_progress_html(report):
+    return render_template('student/progress_report.html', dashboard_data=report)
+
+
+def progress_csv_rows(report):
+    """
+    Yields the report as CSV rows: one per assignment or quiz, with the
+    course title and course-level counts on the first row of each course.
+    """
+    yield ['Course', 'Assignment', 'Status', 'Grade', 'Quiz', 'Quiz Score', 'Lessons Total', 'Discussion Posts', 'Discussion Replies']
+
+    for data in report:
+        # Combine all items to create a single row for each course-item
+        all_items = [(a, None) for a in data['assignments']] + [(None, q) for q in data['quizzes']]
+
+        for item_index, (assignment_data, quiz_data) in enumerate(all_items):
+            assignment_title = ""
+            assignment_status = "N/A"
+            assignment_grade = "N/A"
+            quiz_title = ""
+            quiz_score = "N/A"
+
+            if assignment_data:
+                assignment = assignment_data['assignment']
+                assignment_title = assignment.title
+                assignment_status = assignment_data['status']
+                if assignment.submission_id is not None:
+                    assignment_grade = str(assignment.grade) if assignment.grade is not None else ""
+
+            if quiz_data:
+                quiz = quiz_data['quiz']
+                quiz_title = quiz.title
+                if quiz.submission_id is not None:
+                    quiz_score = str(quiz.score)
+
+            if item_index == 0:
+                course_columns = [data['total_lessons'], data['discussion_posts'], data['discussion_replies']]
+            else:
+                course_columns = ["", "", ""]  # Only the first row of a course carries its totals
+            yield [
+                data['course'].title if item_index == 0 else "",
+                assignment_title,
+                assignment_status,
+                assignment_grade,
+                quiz_title,
+                quiz_score,
+                *course_columns
+            ]
+
+
+PDF_STYLESHEET = '''
+    body { font-family: sans-serif; }
+    h1 { text-align: center; }
+    .course-card { margin-bottom: 20px; border: 1px solid #ccc; padding: 15px; }
+    .course-title { font-size: 1.2em; font-weight: bold; }
+    ul { list-style-type: none; padding-left: 0; }
+    li { margin-bottom: 5px; }
+'''
+
+
+def render_progress_pdf_html(report, student):
+    """Renders the HTML that the PDF rendering pool lays out for this report."""
+    return render_template('student/pdf_template.html', dashboard_data=report, current_user=student)
+
+
+def get_course_gradebook(course, page=1, per_page=50):
+    """
+    Builds one page of a course gradebook for the teacher progress report.
+
+    Students are paginated in SQL, and only the id, title, grade and score
+    columns the report shows are selected. The gradebook entries of the
+    students on the page come from one query and are indexed by
+    (student_id, item_id), so each cell is a dict lookup.
+    """
+    students = db.session.query(User.id, User.username).join(
+        Enrollment, Enrollment.user_id == User.id
+    ).filter(Enrollment.course_id == course.id).order_by(
+        User.username, User.id
+    ).paginate(page=page, per_page=per_page, error_out=False)
+    student_ids = [student.id for student in students.items]
+
+    assignments = db.session.query(Assignment.id, Assignment.title).filter(
+        Assignment.course_id == course.id
+    ).order_by(Assignment.id).all()
+    quizzes = db.session.query(Quiz.id, Quiz.title).filter(
+        Quiz.course_id == course.id
+    ).order_by(Quiz.id).all()
+
+    grades = {}
+    scores = {}
+    if student_ids:
+        entries = db.session.query(
+            GradebookEntry.student_id, GradebookEntry.item_type, GradebookEntry.item_id, GradebookEntry.score
+        ).filter(
+            GradebookEntry.course_id == course.id,
+            GradebookEntry.student_id.in_(student_ids)
+        )
+        for student_id, item_type, item_id, score in entries:
+            (grades if item_type == 'assignment' else scores)[(student_id, item_id)] = score
+
+    return {
+        'students': students,
+        'assignments': assignments,
+        'quizzes': quizzes,
+        'grades': grades,
+        'scores': scores
+    }
@@ -0,0 +1,64 @@
+# services/quiz_cache.py
+
+import threading
+from collections import OrderedDict
+
+
+class ParsedQuizCache:
+    """
+    A small, process-local LRU cache of quiz question lists.
+
+    Entries are keyed by quiz id and remember the quiz's created_at and
+    version they were built from, so editing a quiz invalidates its entry on
+    the next lookup. created_at tells apart a new quiz that reuses the id of
+    a deleted one, since every new quiz starts at version 1 and invalidate()
+    only reaches the worker that handled the delete.
+    The cached lists are shared between requests and must be treated as
+    read-only by callers.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_questions(self, quiz):
+        """
+        Returns the quiz's questions as a list of dicts, in display order.
+        """
+        stamp = (quiz.created_at, quiz.version)
+
+        with self._lock:
+            entry = self._entries.get(quiz.id)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(quiz.id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        questions = [question.to_dict() for question in quiz.questions]
+
+        with self._lock:
+            self._entries[quiz.id] = (stamp, questions)
+            self._entries.move_to_end(quiz.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return questions
+
+    def invalidate(self, quiz_id):
+        with self._lock:
+            self._entries.pop(quiz_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+quiz_cache = ParsedQuizCache()
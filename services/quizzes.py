@@ -0,0 +1,80 @@
+# services/quizzes.py
+
+from sqlalchemy import case, func, select, update
+from extensions import db
+from models import QuizQuestion, QuizSubmission, QuizAnswer
+from services.gradebook import rebuild_item
+
+
+def get_item_analysis(quiz):
+    """
+    Returns per-question statistics for a quiz, computed with one grouped query.
+
+    Each entry holds the question number, type and points, how many students
+    answered it, how many got it right and the average points awarded.
+    """
+    rows = db.session.query(
+        QuizQuestion.position,
+        QuizQuestion.type,
+        QuizQuestion.points,
+        func.count(QuizAnswer.id),
+        func.sum(case((QuizAnswer.is_correct, 1), else_=0)),
+        func.avg(QuizAnswer.awarded_points)
+    ).outerjoin(QuizAnswer, QuizAnswer.question_id == QuizQuestion.id).filter(
+        QuizQuestion.quiz_id == quiz.id
+    ).group_by(QuizQuestion.id).order_by(QuizQuestion.position).all()
+
+    item_stats = []
+    for position, question_type, points, answered, correct, average_points in rows:
+        item_stats.append({
+            'number': position + 1,
+            'type': question_type,
+            'points': points,
+            'answered': answered,
+            'correct': correct or 0,
+            'correct_rate': (correct or 0) / answered * 100 if answered else None,
+            'average_points': round(average_points, 2) if average_points is not None else None
+        })
+    return item_stats
+
+
+def regrade_quiz(quiz):
+    """
+    Re-scores every submission of a quiz against its current answer key.
+
+    Multiple choice answers are re-marked with one set-based UPDATE that
+    compares each submitted answer with its question's key, then every
+    submission's score is recomputed from its awarded points with a second
+    UPDATE. Teacher-awarded points on open-ended answers are kept.
+    Returns the number of submissions that were regraded.
+    """
+    answer_key = select(QuizQuestion.answer).where(
+        QuizQuestion.id == QuizAnswer.question_id
+    ).scalar_subquery()
+    question_points = select(QuizQuestion.points).where(
+        QuizQuestion.id == QuizAnswer.question_id
+    ).scalar_subquery()
+    mcq_question_ids = select(QuizQuestion.id).where(
+        QuizQuestion.quiz_id == quiz.id,
+        QuizQuestion.type == 'multiple_choice'
+    )
+    is_correct = QuizAnswer.submitted_answer == answer_key
+
+    db.session.execute(
+        update(QuizAnswer).where(QuizAnswer.question_id.in_(mcq_question_ids)).values(
+            is_correct=case((is_correct, True), else_=False),
+            awarded_points=case((is_correct, question_points), else_=0)
+        ).execution_options(synchronize_session=False)
+    )
+
+    total_awarded = select(func.coalesce(func.sum(QuizAnswer.awarded_points), 0)).where(
+        QuizAnswer.submission_id == QuizSubmission.id
+    ).scalar_subquery()
+    result = db.session.execute(
+        update(QuizSubmission).where(QuizSubmission.quiz_id == quiz.id).values(
+            score=total_awarded
+        ).execution_options(synchronize_session=False)
+    )
+    rebuild_item('quiz', quiz)
+    db.session.commit()
+    return result.rowcount
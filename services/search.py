@@ -0,0 +1,291 @@
+# services/search.py
+
+import html
+import re
+import sqlalchemy as sa
+from flask import url_for
+from markupsafe import Markup, escape
+from sqlalchemy import event, text
+from extensions import db
+from models import Course, Enrollment, Lesson, DiscussionPost, Reply, Announcement, GeneralAnnouncement
+
+# The search index is not a model: on SQLite it is an FTS5 virtual table, on
+# PostgreSQL a table with a generated tsvector column (see the migration).
+SEARCH_TABLE = 'search_documents'
+
+# Each document's key is source_id * KEY_STRIDE + the code of its source type,
+# so a document can be replaced or deleted by key without scanning the index
+SOURCE_CODES = {
+    'lesson': 1,
+    'discussion_post': 2,
+    'reply': 3,
+    'announcement': 4,
+    'general_announcement': 5,
+}
+KEY_STRIDE = 8
+
+INDEXED_MODELS = (
+    (Lesson, 'lesson'),
+    (DiscussionPost, 'discussion_post'),
+    (Reply, 'reply'),
+    (Announcement, 'announcement'),
+    (GeneralAnnouncement, 'general_announcement'),
+)
+
+SOURCE_LABELS = {
+    'lesson': 'Lesson',
+    'discussion_post': 'Discussion',
+    'reply': 'Reply',
+    'announcement': 'Announcement',
+    'general_announcement': 'General Announcement',
+}
+
+_TAGS = re.compile(r'<[^>]+>')
+_WORDS = re.compile(r'\w+')
+_SPACES = re.compile(r'\s+')
+
+# Placeholders the database puts around matched terms; swapped for <mark> after escaping
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+
+
+def plain_text(content):
+    """Strips the HTML that TinyMCE content is stored as down to plain text."""
+    return _SPACES.sub(' ', html.unescape(_TAGS.sub(' ', content or ''))).strip()
+
+
+def _is_postgres(bind):
+    return bind.dialect.name == 'postgresql'
+
+
+def _index_table(bind):
+    key = 'doc_id' if _is_postgres(bind) else 'rowid'
+    return sa.table(
+        SEARCH_TABLE,
+        sa.column(key, sa.Integer),
+        sa.column('source_type', sa.String),
+        sa.column('source_id', sa.Integer),
+        sa.column('course_id', sa.Integer),
+        sa.column('parent_id', sa.Integer),
+        sa.column('title', sa.Text),
+        sa.column('body', sa.Text),
+    ), key
+
+
+def document_key(source_type, source_id):
+    return source_id * KEY_STRIDE + SOURCE_CODES[source_type]
+
+
+def _document(source_type, target, connection):
+    """Returns the (course_id, parent_id, title, body) a source object is indexed with."""
+    if source_type == 'lesson':
+        return target.course_id, None, target.title, plain_text(target.content)
+    if source_type == 'discussion_post':
+        return target.course_id, None, target.title, plain_text(target.content)
+    if source_type == 'reply':
+        course_id = connection.execute(
+            sa.select(DiscussionPost.course_id).where(DiscussionPost.id == target.post_id)
+        ).scalar()
+        return course_id, target.post_id, '', plain_text(target.content)
+    if source_type == 'announcement':
+        return target.course_id, None, target.title, plain_text(target.content)
+    return None, None, target.title, plain_text(target.content)
+
+
+def index_document(connection, source_type, target):
+    """Adds or replaces the search document of a lesson, post, reply or announcement."""
+    table, key = _index_table(connection)
+    doc_id = document_key(source_type, target.id)
+    course_id, parent_id, title, body = _document(source_type, target, connection)
+    connection.execute(table.delete().where(table.c[key] == doc_id))
+    connection.execute(table.insert().values({
+        key: doc_id, 'source_type': source_type, 'source_id': target.id,
+        'course_id': course_id, 'parent_id': parent_id, 'title': title, 'body': body
+    }))
+
+
+def remove_document(connection, source_type, source_id):
+    table, key = _index_table(connection)
+    connection.execute(table.delete().where(table.c[key] == document_key(source_type, source_id)))
+
+
+def remove_reply_documents(condition):
+    """
+    Removes the documents of the replies matching `condition`, for bulk
+    deletes that bypass the ORM events below (see delete_reply_tree).
+    """
+    table, key = _index_table(db.session.get_bind())
+    doc_ids = sa.select(Reply.id * KEY_STRIDE + SOURCE_CODES['reply']).where(condition)
+    db.session.execute(table.delete().where(table.c[key].in_(doc_ids)))
+
+
+def _register_hooks(model, source_type):
+    # Mapper events run inside the flush, so the index changes commit or
+    # roll back together with the row that caused them
+    def after_write(mapper, connection, target):
+        index_document(connection, source_type, target)
+
+    def after_delete(mapper, connection, target):
+        remove_document(connection, source_type, target.id)
+
+    event.listen(model, 'after_insert', after_write)
+    event.listen(model, 'after_update', after_write)
+    event.listen(model, 'after_delete', after_delete)
+
+
+for _model, _source_type in INDEXED_MODELS:
+    _register_hooks(_model, _source_type)
+
+
+def create_search_index(bind):
+    """
+    Creates the index table if it is missing, for databases built with
+    db.create_all() instead of the migrations. Same schema as the migration.
+    """
+    with bind.begin() as connection:
+        if _is_postgres(connection):
+            connection.execute(text(f"""
+                CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} (
+                    doc_id BIGINT PRIMARY KEY,
+                    source_type VARCHAR(30) NOT NULL,
+                    source_id INTEGER NOT NULL,
+                    course_id INTEGER,
+                    parent_id INTEGER,
+                    title TEXT NOT NULL DEFAULT '',
+                    body TEXT NOT NULL DEFAULT '',
+                    document TSVECTOR GENERATED ALWAYS AS (
+                        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+                        setweight(to_tsvector('english', coalesce(body, '')), 'B')
+                    ) STORED
+                )
+            """))
+            connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_search_documents_document ON {SEARCH_TABLE} USING GIN (document)"))
+            connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_search_documents_course_id ON {SEARCH_TABLE} (course_id)"))
+        else:
+            connection.execute(text(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+                    source_type UNINDEXED, source_id UNINDEXED, course_id UNINDEXED, parent_id UNINDEXED,
+                    title, body, tokenize = 'porter unicode61'
+                )
+            """))
+
+
+def rebuild_search_index():
+    """
+    Re-indexes every lesson, discussion post, reply and announcement and
+    commits. Returns the number of documents written.
+    """
+    connection = db.session.connection()
+    table, _ = _index_table(connection)
+    connection.execute(table.delete())
+    written = 0
+    for model, source_type in INDEXED_MODELS:
+        for target in model.query.all():
+            index_document(connection, source_type, target)
+            written += 1
+    db.session.commit()
+    return written
+
+
+def visible_course_ids(user):
+    """
+    The ids of the courses whose content `user` may search, or None for
+    admins, who may search everything.
+    """
+    if user.role == 'admin':
+        return None
+    course_ids = {course_id for course_id, in db.session.query(Enrollment.course_id).filter_by(user_id=user.id)}
+    if user.role == 'teacher':
+        course_ids.update(course_id for course_id, in db.session.query(Course.id).filter_by(created_by_user_id=user.id))
+    return sorted(course_ids)
+
+
+def _highlight(snippet):
+    """Escapes a snippet and turns the match placeholders into <mark> tags."""
+    escaped = str(escape(snippet or ''))
+    return Markup(escaped.replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>'))
+
+
+def _sqlite_query(terms, course_ids):
+    # Every term must match; the last one also matches as a prefix while the user is typing
+    match = ' '.join(f'"{term}"' for term in terms) + '*'
+    course_filter = '' if course_ids is None else 'AND (course_id IS NULL OR course_id IN :course_ids)'
+    # bm25 weights follow the column order: the four UNINDEXED columns, then title and body
+    statement = text(f"""
+        SELECT source_type, source_id, course_id, parent_id, title,
+               snippet({SEARCH_TABLE}, 5, :mark_start, :mark_end, '...', 16) AS snippet
+        FROM {SEARCH_TABLE}
+        WHERE {SEARCH_TABLE} MATCH :match {course_filter}
+        ORDER BY bm25({SEARCH_TABLE}, 0.0, 0.0, 0.0, 0.0, 10.0, 1.0)
+        LIMIT :limit OFFSET :offset
+    """)
+    return statement, {'match': match}
+
+
+def _postgres_query(terms, course_ids):
+    match = ' & '.join(terms[:-1] + [f"{terms[-1]}:*"])
+    course_filter = '' if course_ids is None else 'AND (course_id IS NULL OR course_id IN :course_ids)'
+    options = f'StartSel="{_MARK_START}", StopSel="{_MARK_END}", MaxWords=30, MinWords=10'
+    statement = text(f"""
+        SELECT source_type, source_id, course_id, parent_id, title,
+               ts_headline('english', body, query, :options) AS snippet
+        FROM {SEARCH_TABLE}, to_tsquery('english', :match) AS query
+        WHERE document @@ query {course_filter}
+        ORDER BY ts_rank_cd(document, query) DESC
+        LIMIT :limit OFFSET :offset
+    """)
+    return statement, {'match': match, 'options': options}
+
+
+def _result_url(row):
+    if row.source_type == 'lesson':
+        return url_for('main.view_lesson', lesson_id=row.source_id)
+    if row.source_type == 'discussion_post':
+        return url_for('main.view_discussion_post', post_id=row.source_id)
+    if row.source_type == 'reply':
+        return url_for('main.view_discussion_post', post_id=row.parent_id)
+    if row.source_type == 'announcement':
+        return url_for('main.view_announcements', course_id=row.course_id)
+    return url_for('main.view_general_announcement', announcement_id=row.source_id)
+
+
+def search(user, query, limit=20, offset=0):
+    """
+    Searches the lessons, discussions and announcements `user` can see.
+
+    Returns (results, has_more). Results are ranked best first, each a dict
+    with the source type label, title, course title, URL and a highlighted
+    snippet (safe to render). One ranked query fetches the page; course and
+    discussion titles are then loaded for the whole page at once.
+    """
+    terms = _WORDS.findall(query or '')[:10]
+    if not terms:
+        return [], False
+
+    course_ids = visible_course_ids(user)
+    bind = db.session.get_bind()
+    build = _postgres_query if _is_postgres(bind) else _sqlite_query
+    statement, params = build(terms, course_ids)
+    if course_ids is not None:
+        statement = statement.bindparams(sa.bindparam('course_ids', expanding=True))
+        params['course_ids'] = course_ids
+    params.update(mark_start=_MARK_START, mark_end=_MARK_END, limit=limit + 1, offset=offset)
+    rows = db.session.execute(statement, params).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    course_titles = dict(db.session.query(Course.id, Course.title).filter(
+        Course.id.in_({row.course_id for row in rows if row.course_id is not None})
+    ).all())
+    post_titles = dict(db.session.query(DiscussionPost.id, DiscussionPost.title).filter(
+        DiscussionPost.id.in_({row.parent_id for row in rows if row.source_type == 'reply'})
+    ).all())
+
+    results = [{
+        'type': SOURCE_LABELS[row.source_type],
+        'title': f"Re: {post_titles.get(row.parent_id, '')}" if row.source_type == 'reply' else row.title,
+        'course': course_titles.get(row.course_id),
+        'url': _result_url(row),
+        'snippet': _highlight(row.snippet),
+    } for row in rows]
+    return results, has_more
@@ -0,0 +1,142 @@
+# services/storage.py
+
+import hashlib
+import os
+import uuid
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from werkzeug.utils import secure_filename
+from extensions import db
+from models import StoredBlob
+from services.uploads import STREAM_BLOCK_SIZE, UPLOAD_TARGETS, CompletedUpload
+
+# Key in Session.info of the files to delete once the transaction commits
+PENDING_REMOVALS = 'storage_pending_removals'
+
+
+def allocate_filename(folder, original_name):
+    """
+    Reserves a collision-free name in `folder` for a file uploaded as
+    `original_name` and returns it.
+
+    The name is the sanitised original behind a random key, claimed with an
+    exclusive create. That is one syscall however many files share the
+    original name, and no two workers can be handed the same name. The caller
+    saves over the empty placeholder.
+    """
+    name = secure_filename(original_name) or 'file'
+    while True:
+        filename = f"{uuid.uuid4().hex[:12]}_{name}"
+        try:
+            fd = os.open(os.path.join(folder, filename), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            continue
+        os.close(fd)
+        return filename
+
+
+def _file_sha256(file):
+    if isinstance(file, CompletedUpload):
+        return file.sha256()
+    digest = hashlib.sha256()
+    for block in iter(lambda: file.stream.read(STREAM_BLOCK_SIZE), b''):
+        digest.update(block)
+    file.stream.seek(0)
+    return digest.hexdigest()
+
+
+def _discard(file):
+    if isinstance(file, CompletedUpload):
+        file.discard()
+
+
+def _add_reference(target, digest):
+    """Bumps the refcount of an existing blob in one UPDATE; returns the blob or None."""
+    updated = StoredBlob.query.filter_by(target=target, sha256=digest).update(
+        {'ref_count': StoredBlob.ref_count + 1}, synchronize_session=False
+    )
+    if not updated:
+        return None
+    return StoredBlob.query.filter_by(target=target, sha256=digest).first()
+
+
+def store_file(file, target):
+    """
+    Stores an uploaded file in the content-addressed store of `target` and
+    returns the name to keep in the owning row's file_path.
+
+    The content is hashed before anything is written, so uploading a file
+    that is already stored only adds a reference and costs no disk space.
+    """
+    folder = current_app.config[UPLOAD_TARGETS[target]]
+    digest = _file_sha256(file)
+
+    blob = _add_reference(target, digest)
+    if blob is not None:
+        _discard(file)
+        return blob.filename
+
+    ext = os.path.splitext(secure_filename(file.filename))[1].lower()
+    filename = f"{digest}{ext}"
+    filepath = os.path.join(folder, filename)
+    # Written under a reserved name first so a half-written blob is never visible
+    temp_path = os.path.join(folder, allocate_filename(folder, file.filename))
+    file.save(temp_path)
+    try:
+        with db.session.begin_nested():
+            db.session.add(StoredBlob(
+                target=target,
+                sha256=digest,
+                filename=filename,
+                size=os.path.getsize(temp_path),
+                ref_count=1
+            ))
+    except IntegrityError:
+        # Another request stored the same content first; share its blob instead
+        os.remove(temp_path)
+        return _add_reference(target, digest).filename
+    # Only the request whose row was inserted moves its copy into place
+    os.replace(temp_path, filepath)
+    return filename
+
+
+def release_file(filename, target):
+    """
+    Drops one reference to a stored file, deleting it from disk once nothing
+    points at it any more. Files saved before deduplication have no blob row
+    and belong to a single record, so they are always deleted. The file is
+    removed after the session commits, not when this is called.
+    """
+    if not filename:
+        return
+    filepath = os.path.join(current_app.config[UPLOAD_TARGETS[target]], filename)
+
+    blob = StoredBlob.query.filter_by(target=target, filename=filename).first()
+    if blob is not None:
+        StoredBlob.query.filter_by(id=blob.id).update(
+            {'ref_count': StoredBlob.ref_count - 1}, synchronize_session=False
+        )
+        db.session.refresh(blob)
+        if blob.ref_count > 0:
+            return
+        db.session.delete(blob)
+
+    # Deleted only once the commit succeeds; a rollback keeps the file the rows still point at
+    db.session.info.setdefault(PENDING_REMOVALS, []).append(filepath)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _remove_released_files(session):
+    for filepath in session.info.pop(PENDING_REMOVALS, ()):
+        try:
+            os.remove(filepath)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error removing released file: {e}")
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _keep_released_files(session):
+    session.info.pop(PENDING_REMOVALS, None)
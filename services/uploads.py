@@ -0,0 +1,160 @@
+# services/uploads.py
+
+import hashlib
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app, request
+from flask_login import current_user
+from extensions import db
+from models import ChunkedUpload
+
+# Maps an upload target to the config key of the folder its files end up in
+UPLOAD_TARGETS = {
+    'courses': 'UPLOAD_FOLDERS',
+    'assignments': 'UPLOAD_FOLDER',
+}
+
+# Largest chunk accepted in one request, and the block size used to stream it to disk
+MAX_CHUNK_SIZE = 8 * 1024 * 1024
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+class ChunkError(Exception):
+    """Raised when a chunk cannot be accepted; carries the HTTP status to return."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class CompletedUpload:
+    """
+    Wraps a finished chunked upload so routes can treat it like a werkzeug
+    FileStorage: it has a `filename` and a `save(path)` that moves the
+    assembled file into place instead of copying it.
+    """
+
+    def __init__(self, upload):
+        self.upload = upload
+        self.filename = upload.filename
+
+    def save(self, destination):
+        shutil.move(partial_path(self.upload.id), destination)
+        db.session.delete(self.upload)
+
+    def sha256(self):
+        digest = hashlib.sha256()
+        with open(partial_path(self.upload.id), 'rb') as partial:
+            for block in iter(lambda: partial.read(STREAM_BLOCK_SIZE), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def discard(self):
+        """Drops the assembled file when its content is already stored elsewhere."""
+        try:
+            os.remove(partial_path(self.upload.id))
+        except OSError:
+            pass
+        db.session.delete(self.upload)
+
+
+def partial_path(upload_id):
+    return os.path.join(current_app.config['CHUNKED_UPLOAD_FOLDER'], f"{upload_id}.part")
+
+
+def create_upload(user, filename, total_size, target):
+    """
+    Starts a resumable upload session and creates its empty partial file.
+    """
+    upload = ChunkedUpload(
+        id=uuid.uuid4().hex,
+        user_id=user.id,
+        target=target,
+        filename=filename,
+        total_size=total_size
+    )
+    open(partial_path(upload.id), 'wb').close()
+    db.session.add(upload)
+    db.session.commit()
+    return upload
+
+
+def write_chunk(upload, offset, stream, checksum=None):
+    """
+    Streams one chunk from `stream` into the partial file at `offset`.
+
+    The chunk is written in small blocks so memory stays bounded, and its
+    SHA-256 is compared with `checksum` when the client supplied one. A chunk
+    that fails verification is truncated away so the client can resend it.
+    """
+    if offset != upload.received_bytes:
+        raise ChunkError(f"Expected offset {upload.received_bytes}.", status=409)
+
+    path = partial_path(upload.id)
+    digest = hashlib.sha256()
+    written = 0
+    with open(path, 'r+b') as partial:
+        partial.seek(offset)
+        partial.truncate()
+        while True:
+            block = stream.read(STREAM_BLOCK_SIZE)
+            if not block:
+                break
+            written += len(block)
+            if written > MAX_CHUNK_SIZE or offset + written > upload.total_size:
+                partial.truncate(offset)
+                raise ChunkError("Chunk is larger than allowed.", status=413)
+            digest.update(block)
+            partial.write(block)
+
+        if checksum and digest.hexdigest() != checksum.lower():
+            partial.truncate(offset)
+            raise ChunkError("Chunk checksum mismatch.")
+
+    # Only advance if nobody else has in the meantime, so parallel retries cannot double count
+    advanced = ChunkedUpload.query.filter_by(id=upload.id, received_bytes=offset).update(
+        {'received_bytes': offset + written, 'updated_at': datetime.utcnow()}, synchronize_session=False
+    )
+    db.session.commit()
+    if not advanced:
+        raise ChunkError("Upload offset changed while writing.", status=409)
+    db.session.refresh(upload)
+    return upload
+
+
+def get_uploaded_file(target, field='file'):
+    """
+    Returns the file submitted for `field`, whether it came as a regular
+    multipart upload or as a completed chunked upload referenced by the
+    `<field>_upload_id` form value. Returns None if neither was provided.
+    """
+    file = request.files.get(field)
+    if file and file.filename != '':
+        return file
+
+    upload_id = request.form.get(f'{field}_upload_id')
+    if not upload_id:
+        return None
+    upload = ChunkedUpload.query.filter_by(id=upload_id, user_id=current_user.id, target=target).first()
+    if upload is None or not upload.is_complete:
+        return None
+    return CompletedUpload(upload)
+
+
+def remove_stale_uploads(max_age=timedelta(days=1)):
+    """
+    Deletes unfinished uploads that have not received data for `max_age`.
+    Returns the number of uploads removed.
+    """
+    cutoff = datetime.utcnow() - max_age
+    stale = ChunkedUpload.query.filter(ChunkedUpload.updated_at < cutoff).all()
+    for upload in stale:
+        try:
+            os.remove(partial_path(upload.id))
+        except OSError:
+            pass
+        db.session.delete(upload)
+    db.session.commit()
+    return len(stale)
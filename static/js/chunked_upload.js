@@ -0,0 +1,135 @@
+// static/js/chunked_upload.js
+//
+// Resumable, chunked uploads for file inputs marked with `data-chunked-upload`.
+// The file is sent as soon as it is chosen, one checksummed chunk at a time, and
+// the form then submits only the hidden `<name>_upload_id` field instead of the
+// file itself. If the connection drops, choosing the same file again resumes
+// from the last chunk the server confirmed.
+(function () {
+    const MAX_RETRIES = 5;
+
+    function storageKey(file, target) {
+        return `chunked-upload:${target}:${file.name}:${file.size}:${file.lastModified}`;
+    }
+
+    async function sha256Hex(blob) {
+        if (!window.crypto || !window.crypto.subtle) {
+            return null; // Checksums need a secure context; the server treats them as optional
+        }
+        const digest = await window.crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+        return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+    }
+
+    async function requestJson(url, options) {
+        const response = await fetch(url, Object.assign({ credentials: 'same-origin' }, options));
+        const data = await response.json().catch(() => ({}));
+        return { ok: response.ok, status: response.status, data: data };
+    }
+
+    async function startOrResume(input, file) {
+        const target = input.dataset.uploadTarget;
+        const baseUrl = input.dataset.chunkedUpload;
+        const key = storageKey(file, target);
+        const saved = localStorage.getItem(key);
+
+        if (saved) {
+            const status = await requestJson(`${baseUrl}/${saved}`, { method: 'GET' });
+            if (status.ok) {
+                return { uploadId: saved, received: status.data.received_bytes, chunkSize: status.data.chunk_size };
+            }
+            localStorage.removeItem(key);
+        }
+
+        const created = await requestJson(baseUrl, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ filename: file.name, size: file.size, target: target })
+        });
+        if (!created.ok) {
+            throw new Error(created.data.error || `Upload could not be started (HTTP ${created.status}).`);
+        }
+        localStorage.setItem(key, created.data.upload_id);
+        return { uploadId: created.data.upload_id, received: created.data.received_bytes, chunkSize: created.data.chunk_size };
+    }
+
+    async function uploadFile(input, file, onProgress) {
+        const baseUrl = input.dataset.chunkedUpload;
+        let { uploadId, received, chunkSize } = await startOrResume(input, file);
+        chunkSize = chunkSize || 5 * 1024 * 1024;
+        let retries = 0;
+
+        while (received < file.size) {
+            const chunk = file.slice(received, received + chunkSize);
+            const headers = { 'Content-Type': 'application/octet-stream' };
+            const checksum = await sha256Hex(chunk);
+            if (checksum) {
+                headers['X-Chunk-SHA256'] = checksum;
+            }
+
+            let result;
+            try {
+                result = await requestJson(`${baseUrl}/${uploadId}?offset=${received}`, { method: 'PUT', headers: headers, body: chunk });
+            } catch (networkError) {
+                result = { ok: false, status: 0, data: {} };
+            }
+
+            if (result.ok) {
+                received = result.data.received_bytes;
+                retries = 0;
+                onProgress(received / file.size);
+            } else if (typeof result.data.received_bytes === 'number' && result.status !== 413) {
+                received = result.data.received_bytes; // Resynchronise with what the server has
+                if (++retries > MAX_RETRIES) throw new Error(result.data.error || 'Upload failed.');
+            } else if (++retries > MAX_RETRIES || result.status === 413) {
+                throw new Error(result.data.error || 'Upload failed. Choose the file again to resume.');
+            } else {
+                await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+            }
+        }
+
+        localStorage.removeItem(storageKey(file, input.dataset.uploadTarget));
+        return uploadId;
+    }
+
+    function attach(input) {
+        const form = input.closest('form');
+        const fieldName = input.name;
+        const hidden = document.createElement('input');
+        hidden.type = 'hidden';
+        hidden.name = `${fieldName}_upload_id`;
+        form.appendChild(hidden);
+
+        const status = document.createElement('p');
+        status.className = 'text-sm text-gray-500 mt-2';
+        input.insertAdjacentElement('afterend', status);
+
+        input.addEventListener('change', async () => {
+            const file = input.files[0];
+            hidden.value = '';
+            input.name = fieldName;
+            if (!file) return;
+
+            const buttons = form.querySelectorAll('button[type="submit"]');
+            buttons.forEach(button => button.disabled = true);
+            status.textContent = 'Uploading... 0%';
+
+            try {
+                hidden.value = await uploadFile(input, file, fraction => {
+                    status.textContent = `Uploading... ${Math.floor(fraction * 100)}%`;
+                });
+                // The file is already on the server, so the form only sends its id
+                input.removeAttribute('name');
+                input.required = false;
+                status.textContent = 'Upload complete.';
+            } catch (error) {
+                status.textContent = error.message;
+            } finally {
+                buttons.forEach(button => button.disabled = false);
+            }
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', () => {
+        document.querySelectorAll('input[type="file"][data-chunked-upload]').forEach(attach);
+    });
+})();
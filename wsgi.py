@@ -1,4 +1,9 @@
 from app import create_app
+from services.media import start_media_workers
 
 # Create the Flask application instance
 app = create_app()
+
+# Each gunicorn worker imports this module, so every worker resumes the media
+# jobs that a dead worker left queued or running
+start_media_workers(app)